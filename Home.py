@@ -1,10 +1,13 @@
 import streamlit as st
-import PyPDF2
 from datetime import datetime
 from utils.database import init_database, save_cim_to_database, log_audit_action
-from utils.ai_analysis import extract_section_headers, split_text_by_sections, detect_red_flags, extract_valuation_metrics
 from utils.session_state import initialize_session_state
 from utils.styling import apply_custom_css
+from utils.pdf_extraction import read_pdf_bytes
+from utils.text_cache import extract_pages_cached, get_text_cache
+from utils.document import PagedDocument
+from utils.job_queue import FINISHED, ensure_workers, get_job_queue, submit_cim_job
+from utils.sections import SECTION_TREE_KEY, build_section_tree, section_texts
 
 # Page config
 st.set_page_config(
@@ -17,20 +20,79 @@ st.set_page_config(
 apply_custom_css()
 init_database()
 initialize_session_state()
+if 'cim_job_id' not in st.session_state:
+    st.session_state.cim_job_id = None
+if 'cim_job_name' not in st.session_state:
+    st.session_state.cim_job_name = None
 
-def extract_text_from_pdf(pdf_file):
-    """Extract text from PDF using PyPDF2"""
-    try:
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page in pdf_reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n\n"
-        return text
-    except Exception as e:
-        st.error(f"Error reading PDF: {e}")
-        return None
+def pick_up_cim_job():
+    """Load the CIM processed by a finished background job into the session"""
+    job = get_job_queue().get(st.session_state.cim_job_id)
+    if job is not None and job['status'] not in FINISHED:
+        return
+    st.session_state.cim_job_id = None
+    if job is None:
+        st.error("Error processing CIM: the processing job no longer exists, please process it again")
+        return
+    if job['status'] == 'cancelled':
+        return
+    if job['status'] == 'failed':
+        st.error(f"Error processing CIM: {job['error']}")
+        return
+    
+    result = job['result']
+    doc_hash = result['doc_hash']
+    pages = get_text_cache().get_pages(doc_hash)
+    if pages is None:
+        # Evicted from the text cache since the job ran: extract again from the saved upload
+        try:
+            doc_hash, pages = extract_pages_cached(read_pdf_bytes(job['payload']['path']))
+        except Exception as e:
+            st.error(f"Error reading PDF: {e}")
+            return
+    document = PagedDocument(pages)
+    text = document.text
+    st.session_state.doc_hash = doc_hash
+    st.session_state.cim_document = document
+    st.session_state.cim_text = text
+    
+    # Save to database
+    cim_id = save_cim_to_database(st.session_state.cim_job_name, text, st.session_state.current_user)
+    st.session_state.current_cim_id = cim_id
+    
+    # Section tree was built by the worker; cached() only rebuilds it if the cache was evicted since
+    tree = get_text_cache().cached(doc_hash, SECTION_TREE_KEY, lambda: build_section_tree(text, document))
+    st.session_state.cim_section_tree = tree
+    sections = section_texts(text, tree)
+    st.session_state.cim_sections = sections
+    
+    for name, error in result.get('analysis_errors', {}).items():
+        st.warning(f"⚠️ {name.replace('_', ' ').capitalize()} analysis failed: {error}")
+    red_flags = result.get('red_flags') or []
+    st.session_state.red_flags = red_flags
+    st.session_state.valuation_data = result.get('valuation_data') or {}
+    
+    st.success(f"✅ CIM processed! Extracted {len(text):,} characters, {len(sections)} sections, {len(red_flags)} red flags detected")
+
+@st.fragment(run_every=2.0)
+def show_cim_job():
+    """Status of the background processing job; reruns the app once it has finished"""
+    job_id = st.session_state.cim_job_id
+    if job_id is None:
+        return
+    job = get_job_queue().get(job_id)
+    if job is None or job['status'] in FINISHED:
+        st.rerun()
+    name = st.session_state.cim_job_name
+    if job['status'] == 'queued':
+        # Workers exit when idle or may have died; start a pool again if none is alive
+        ensure_workers()
+        st.info(f"⏳ {name} is queued for processing")
+    else:
+        st.info(f"🔄 Processing {name} in the background - you can keep working meanwhile")
+    if st.button("✖ Cancel", key="cancel_cim_job"):
+        get_job_queue().cancel(job_id)
+        st.rerun()
 
 def main():
     # Main title
@@ -111,30 +173,19 @@ def main():
         )
         
         if uploaded_file and api_key:
-            if st.button("🔍 Process CIM", type="primary"):
-                with st.spinner("🔄 Processing CIM..."):
-                    text = extract_text_from_pdf(uploaded_file)
-                    if text:
-                        # Save to database
-                        cim_id = save_cim_to_database(uploaded_file.name, text, st.session_state.current_user)
-                        st.session_state.current_cim_id = cim_id
-                        st.session_state.cim_text = text
-                        
-                        # Extract sections
-                        headers = extract_section_headers(text)
-                        sections = split_text_by_sections(text, headers)
-                        st.session_state.cim_sections = sections
-                        
-                        # Detect red flags
-                        red_flags = detect_red_flags(text, api_key)
-                        st.session_state.red_flags = red_flags
-                        
-                        # Extract valuation metrics
-                        valuation_data = extract_valuation_metrics(text, api_key)
-                        st.session_state.valuation_data = valuation_data
-                        
-                        st.success(f"✅ CIM processed! Extracted {len(text):,} characters, {len(sections)} sections, {len(red_flags)} red flags detected")
-                        st.rerun()
+            if st.button("🔍 Process CIM", type="primary", disabled=st.session_state.cim_job_id is not None):
+                # Extraction, sections, embeddings and analyses run in a worker process; this run only queues them
+                try:
+                    st.session_state.cim_job_id = submit_cim_job(read_pdf_bytes(uploaded_file), api_key=api_key)
+                    st.session_state.cim_job_name = uploaded_file.name
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Error reading PDF: {e}")
+        
+        show_cim_job()
+    
+    if st.session_state.cim_job_id is not None:
+        pick_up_cim_job()
     
     # Main content area
     if st.session_state.cim_text is None:
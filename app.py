@@ -10,7 +10,24 @@ import sqlite3
 import hashlib
 from datetime import datetime, timedelta
 import base64
+import io
 import numpy as np
+from contextlib import nullcontext
+
+from utils.text_cache import extract_pages_cached, get_text_cache
+from utils.storage import document_hash
+from utils.ingest import BackgroundIngest
+from utils.document import PagedDocument
+from utils.embeddings import EMBED_MODEL_NAME, embed_texts
+from utils.chunking import chunk_text, map_chunks_to_pages
+from utils.index_store import get_index_store
+from utils.corpus_index import get_corpus_index
+from utils.vector_index import build_index, choose_index_kind, index_config, search_index
+from utils.bm25 import BM25Index
+from utils.retrieval import hybrid_search, max_fused_score, search_complete
+from utils.query_cache import encode_query, get_search_result_cache
+from utils.context_packer import DEFAULT_CONTEXT_TOKENS, pack_context
+from utils.summarizer import summarize_document
 
 # Semantic search dependencies
 try:
@@ -117,6 +134,14 @@ if 'current_page' not in st.session_state:
     st.session_state.current_page = 1
 if 'pdf_reader' not in st.session_state:
     st.session_state.pdf_reader = None
+if 'doc_hash' not in st.session_state:
+    st.session_state.doc_hash = None
+if 'cim_document' not in st.session_state:
+    st.session_state.cim_document = None
+if 'ingest_job' not in st.session_state:
+    st.session_state.ingest_job = None
+if 'ingest_synced' not in st.session_state:
+    st.session_state.ingest_synced = None
 
 # Semantic search state
 if 'text_chunks' not in st.session_state:
@@ -125,10 +150,20 @@ if 'semantic_index' not in st.session_state:
     st.session_state.semantic_index = None
 if 'chunk_embeddings' not in st.session_state:
     st.session_state.chunk_embeddings = None
+if 'bm25_index' not in st.session_state:
+    st.session_state.bm25_index = None
+if 'search_stats' not in st.session_state:
+    st.session_state.search_stats = {}
 if 'chunk_page_mapping' not in st.session_state:
     st.session_state.chunk_page_mapping = []
+if 'chunk_spans' not in st.session_state:
+    st.session_state.chunk_spans = []
 if 'embed_model' not in st.session_state:
     st.session_state.embed_model = None
+if 'index_variant' not in st.session_state:
+    st.session_state.index_variant = 'fast'
+if 'embed_stats' not in st.session_state:
+    st.session_state.embed_stats = {}
 if 'search_highlights' not in st.session_state:
     st.session_state.search_highlights = []
 if 'selected_result' not in st.session_state:
@@ -143,42 +178,12 @@ def load_embedding_model():
         return None
     try:
         # Use a much smaller and faster model
-        model = SentenceTransformer('all-MiniLM-L6-v2')
+        model = SentenceTransformer(EMBED_MODEL_NAME)
         return model
     except Exception as e:
         st.error(f"Error loading embedding model: {e}")
         return None
 
-def chunk_text(text, chunk_size=500, overlap=100, fast_mode=True):
-    """Split text into smaller, faster-to-process chunks"""
-    chunks = []
-    
-    if fast_mode:
-        # Super fast chunking - just split by paragraphs
-        paragraphs = text.split('\n\n')
-        # Take every other paragraph and limit to 20 chunks
-        chunks = [p.strip() for i, p in enumerate(paragraphs) if i % 2 == 0 and p.strip()][:20]
-    else:
-        # More thorough chunking
-        sentences = text.split('. ')
-        current_chunk = ""
-        
-        for sentence in sentences:
-            if len(current_chunk) + len(sentence) < chunk_size:
-                current_chunk += sentence + ". "
-            else:
-                if current_chunk.strip():
-                    chunks.append(current_chunk.strip())
-                current_chunk = sentence + ". "
-        
-        if current_chunk.strip():
-            chunks.append(current_chunk.strip())
-        
-        # Limit chunks for faster processing
-        chunks = chunks[:50]
-    
-    return chunks, []
-
 def extract_search_terms_from_results(results, query):
     """Extract key terms from search results for highlighting"""
     terms = set()
@@ -233,89 +238,278 @@ def create_better_annotations(results, search_query):
     
     return annotations
 
-def map_chunks_to_pages(chunks, pdf_reader):
-    """Simplified page mapping for speed"""
-    # Simple approximation - assume even distribution
-    total_pages = len(pdf_reader.pages)
-    chunks_per_page = max(1, len(chunks) // total_pages)
+def chunk_page_batch(batch, fast_mode=True, bm25_index=None):
+    """Chunk one ingest batch and resolve each chunk's page once, at ingest time"""
+    chunks, spans = chunk_text(batch['text'], fast_mode=fast_mode, offset=batch['offset'])
+    if bm25_index is not None:
+        bm25_index.add_documents(chunks)
+    return chunks, map_chunks_to_pages(spans, batch['document']), spans
+
+def use_stored_index(stored, document, bm25_index=None):
+    """Point session state at a persisted index shared by every session"""
+    if bm25_index is None:
+        bm25_index = BM25Index()
+        bm25_index.add_documents(stored.chunks)
+    st.session_state.cim_document = document
+    st.session_state.cim_text = document.text
+    st.session_state.text_chunks = stored.chunks
+    st.session_state.chunk_page_mapping = stored.chunk_pages
+    st.session_state.chunk_spans = stored.chunk_spans
+    st.session_state.semantic_index = stored.index
+    st.session_state.chunk_embeddings = stored.embeddings
+    st.session_state.bm25_index = bm25_index
+
+def add_to_corpus(doc_hash, name, deal, variant, embeddings, chunk_pages, chunk_spans):
+    """Make a document searchable from the cross-document corpus (no-op if already there)"""
+    get_corpus_index(EMBED_MODEL_NAME).add_document(
+        doc_hash, name, embeddings, chunk_pages, chunk_spans, deal=deal or None, index_variant=variant
+    )
+
+def start_ingest(pdf_bytes, fast_mode=True, name=None, deal=None):
+    """Start streaming ingestion of the uploaded PDF in the background"""
+    if st.session_state.ingest_job is not None:
+        st.session_state.ingest_job.cancel()
+    
+    st.session_state.last_search_results = []
+    st.session_state.search_highlights = []
+    
+    embed_fn = None
+    new_index = None
+    on_complete = None
+    model = st.session_state.embed_model
+    variant = 'fast' if fast_mode else 'full'
+    embed_stats = {}
+    bm25_index = BM25Index()
+    if SEMANTIC_SEARCH_AVAILABLE and model:
+        # Already embedded by anyone on this server: just load it
+        doc_hash = document_hash(pdf_bytes)
+        stored = get_index_store().load(doc_hash, EMBED_MODEL_NAME, variant)
+        if stored is not None:
+            _, pages = extract_pages_cached(pdf_bytes)
+            st.session_state.embed_stats = embed_stats
+            st.session_state.index_variant = variant
+            st.session_state.ingest_job = None
+            st.session_state.doc_hash = doc_hash
+            use_stored_index(stored, PagedDocument(pages))
+            if not get_corpus_index(EMBED_MODEL_NAME).has_document(doc_hash):
+                add_to_corpus(doc_hash, name, deal, variant, stored.embeddings, stored.chunk_pages, stored.chunk_spans)
+            return
+        
+        def on_complete(job):
+            if job.index is not None:
+                embeddings = job.embedding_matrix()
+                # Streaming builds a flat float32 index; very large documents get an ANN
+                # index, and quantized storage (if configured) replaces the float32 codes
+                index = job.index
+                if choose_index_kind(len(embeddings)) != 'flat' or index_config()['quantization']:
+                    index = build_index(embeddings)
+                get_index_store().save(job.doc_hash, EMBED_MODEL_NAME, index, embeddings,
+                                       job.chunks, job.chunk_pages, job.chunk_spans, variant)
+                add_to_corpus(job.doc_hash, name, deal, variant, embeddings, job.chunk_pages, job.chunk_spans)
+        
+        embed_fn = lambda chunks: embed_texts(model, chunks, stats=embed_stats)
+        new_index = faiss.IndexFlatL2
+    st.session_state.embed_stats = embed_stats
+    st.session_state.index_variant = variant
+    
+    job = BackgroundIngest(
+        pdf_bytes,
+        lambda batch: chunk_page_batch(batch, fast_mode=fast_mode, bm25_index=bm25_index),
+        embed_fn=embed_fn,
+        new_index=new_index,
+        on_complete=on_complete
+    ).start()
+    st.session_state.ingest_job = job
+    st.session_state.ingest_synced = None
+    st.session_state.doc_hash = job.doc_hash
+    st.session_state.cim_text = ""
+    st.session_state.cim_document = job.document
+    st.session_state.text_chunks = job.chunks
+    st.session_state.chunk_page_mapping = job.chunk_pages
+    st.session_state.chunk_spans = job.chunk_spans
+    st.session_state.semantic_index = None
+    st.session_state.chunk_embeddings = None
+    st.session_state.bm25_index = bm25_index
+
+def sync_ingest_state():
+    """Point session state at everything the background ingest has indexed so far"""
+    job = st.session_state.ingest_job
+    if job is None:
+        return
     
-    page_mapping = []
-    for i, chunk in enumerate(chunks):
-        page_num = min(total_pages, (i // chunks_per_page) + 1)
-        page_mapping.append(page_num)
+    st.session_state.cim_text = job.text
+    st.session_state.cim_document = job.document
+    st.session_state.text_chunks = job.chunks
+    st.session_state.chunk_page_mapping = job.chunk_pages
+    st.session_state.chunk_spans = job.chunk_spans
+    st.session_state.semantic_index = job.index
+    st.session_state.ingest_synced = (job.batches_done > 0, job.done)
     
-    return page_mapping
+    # Once persisted, swap to the shared on-disk copy and let the job go
+    if job.done and not job.error and job.index is not None:
+        stored = get_index_store().load(job.doc_hash, EMBED_MODEL_NAME, st.session_state.index_variant)
+        if stored is not None:
+            use_stored_index(stored, job.document, st.session_state.bm25_index)
+            st.session_state.ingest_job = None
 
-def create_semantic_index(chunks):
-    """Create FAISS index with optimizations for speed"""
-    if not SEMANTIC_SEARCH_AVAILABLE or not st.session_state.embed_model:
-        return None, None
+def ingest_lock():
+    """Lock guarding the live index while the background ingest may be adding to it"""
+    job = st.session_state.ingest_job
+    return job.lock if job is not None else nullcontext()
+
+@st.fragment(run_every=1.0)
+def show_ingest_progress():
+    """Progress bar for the background ingest; reruns the app when new content becomes searchable"""
+    job = st.session_state.ingest_job
+    if job is None:
+        return
     
-    try:
-        # Limit chunks for faster processing
-        limited_chunks = chunks[:30]  # Process max 30 chunks for speed
-        
-        # Generate embeddings with smaller batch size
-        with st.spinner("🧠 Creating search index..."):
-            embeddings = st.session_state.embed_model.encode(
-                limited_chunks, 
-                show_progress_bar=False,
-                batch_size=8,  # Smaller batch for speed
-                convert_to_numpy=True
-            )
-        
-        # Create FAISS index
-        dim = embeddings.shape[1]
-        index = faiss.IndexFlatL2(dim)
-        index.add(embeddings)
-        
-        return index, embeddings
-    except Exception as e:
-        st.error(f"Error creating semantic index: {e}")
-        return None, None
+    if (job.batches_done > 0, job.done) != st.session_state.ingest_synced:
+        st.rerun()
+    
+    if job.error:
+        st.error(f"Error reading PDF: {job.error}")
+    elif not job.done:
+        total = job.total_pages or "?"
+        st.progress(job.progress, text=f"📥 Indexed {job.document.num_pages}/{total} pages - search covers the pages indexed so far")
 
 def semantic_search(query, chunks, index, top_k=5):
-    """Perform semantic search on chunks"""
+    """Hybrid search on chunks: BM25 and vector legs in parallel, fused by rank"""
     if not SEMANTIC_SEARCH_AVAILABLE or not st.session_state.embed_model or index is None:
         return []
     
     try:
-        # Encode query
-        query_embedding = st.session_state.embed_model.encode([query])
-        
-        # Search
-        distances, indices = index.search(np.array(query_embedding), min(top_k, len(chunks)))
-        
-        # Return results with scores
+        # Legs run on worker threads, so capture everything they need from session state here
+        model = st.session_state.embed_model
+        exact_vectors = st.session_state.chunk_embeddings
+        bm25_index = st.session_state.bm25_index
+        page_mapping = st.session_state.chunk_page_mapping
+        lock = ingest_lock()
+        
+        # Shared across sessions; the version moves whenever the index does (streaming, variant swap)
+        result_cache = get_search_result_cache()
+        doc_hash = st.session_state.doc_hash
+        version = (st.session_state.index_variant, index.ntotal, len(bm25_index) if bm25_index is not None else 0)
+        cached = result_cache.get(doc_hash, query, top_k, version)
+        if cached is not None:
+            st.session_state.search_stats = {'cached': True}
+            return cached
+        
+        def vector_leg(query, k):
+            query_embedding = encode_query(model, EMBED_MODEL_NAME, query)
+            with lock:
+                # Quantized indexes are re-ranked against the exact vectors on disk
+                _, indices = search_index(index, query_embedding, min(k, index.ntotal), exact_vectors=exact_vectors)
+            return [idx for idx in indices[0] if 0 <= idx < len(chunks)]
+        
+        legs = {'vector': vector_leg}
+        if bm25_index is not None:
+            legs['bm25'] = lambda query, k: [idx for _, idx in bm25_index.top_k(query, k) if idx < len(chunks)]
+        
+        stats = {}
+        fused = hybrid_search(query, legs, top_k=top_k, texts=chunks, stats=stats)
+        st.session_state.search_stats = stats
+        
+        # Return results with scores (1.0 = ranked first by every leg)
+        best = max_fused_score(legs)
         results = []
-        for i, (distance, idx) in enumerate(zip(distances[0], indices[0])):
-            if idx < len(chunks):
-                similarity_score = 1 / (1 + distance)  # Convert distance to similarity
-                results.append({
-                    'chunk': chunks[idx],
-                    'index': idx,
-                    'similarity': similarity_score,
-                    'page': st.session_state.chunk_page_mapping[idx] if idx < len(st.session_state.chunk_page_mapping) else 1
-                })
+        for score, idx in fused:
+            results.append({
+                'chunk': chunks[idx],
+                'index': idx,
+                'similarity': min(1.0, score / best),
+                'page': page_mapping[idx] if idx < len(page_mapping) else 1
+            })
         
+        if search_complete(stats):
+            result_cache.put(doc_hash, query, top_k, version, results)
         return results
     except Exception as e:
         st.error(f"Error in semantic search: {e}")
         return []
 
-def extract_text_from_pdf(pdf_file):
-    """Extract text from PDF using PyPDF2"""
+def corpus_search(query, top_k=10, doc_hashes=None, deals=None, date_from=None):
+    """Search every processed CIM, attaching each hit's chunk text from the text cache"""
+    if not SEMANTIC_SEARCH_AVAILABLE or not st.session_state.embed_model:
+        return []
+    
     try:
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page in pdf_reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n\n"
-        return text, pdf_reader
+        query_embedding = encode_query(st.session_state.embed_model, EMBED_MODEL_NAME, query)
+        results = get_corpus_index(EMBED_MODEL_NAME).search(
+            query_embedding, top_k=top_k, doc_hashes=doc_hashes, deals=deals, date_from=date_from
+        )
+        # The corpus table records each chunk's offsets, so a hit's text is sliced from the cached
+        # pages instead of loading the document's whole stored index and chunk list
+        text_cache = get_text_cache()
+        documents = {}
+        for result in results:
+            doc_hash = result['doc_hash']
+            if doc_hash not in documents:
+                pages = text_cache.get_pages(doc_hash)
+                documents[doc_hash] = PagedDocument(pages) if pages is not None else None
+            document = documents[doc_hash]
+            result['text'] = document.slice(result['start'], result['end']) if document and result['start'] >= 0 else ""
+        return results
     except Exception as e:
-        st.error(f"Error reading PDF: {e}")
-        return None, None
+        st.error(f"Error in corpus search: {e}")
+        return []
+
+def show_corpus_search():
+    """Search across every CIM processed on this server"""
+    st.subheader("🗂️ Search All CIMs")
+    
+    if not SEMANTIC_SEARCH_AVAILABLE:
+        st.error("❌ Semantic search requires additional packages.")
+        return
+    
+    corpus = get_corpus_index(EMBED_MODEL_NAME)
+    corpus.refresh()
+    if not corpus.documents:
+        st.info("No CIMs have been indexed yet.")
+        return
+    
+    index_stats = corpus.stats()
+    st.caption(f"{len(corpus.documents)} documents | {len(corpus.table):,} chunks | "
+               f"{index_stats['kind']} index ({index_stats['quantization'] or 'float32'}), "
+               f"{index_stats['memory_bytes'] / 1e6:.1f} MB")
+    
+    with st.expander("⚙️ Index accuracy"):
+        st.caption("Compares the ANN index against exact brute-force search over the stored vectors")
+        if st.button("Measure recall@10"):
+            with st.spinner("Running exact search for comparison..."):
+                recall = corpus.recall_at_k(k=10)
+            st.metric("Recall@10", f"{recall:.1%}")
+    
+    query = st.text_input("Search every processed CIM:", placeholder="e.g., customer concentration", key="corpus_query")
+    
+    filter_col1, filter_col2, filter_col3 = st.columns(3)
+    with filter_col1:
+        names = {doc['name'] or doc['doc_hash'][:12]: doc['doc_hash'] for doc in corpus.documents}
+        selected_names = st.multiselect("Documents", list(names))
+    with filter_col2:
+        deals = sorted({doc['deal'] for doc in corpus.documents if doc.get('deal')})
+        selected_deals = st.multiselect("Deals", deals)
+    with filter_col3:
+        date_from = st.date_input("Processed on or after", value=None)
+    
+    if query and st.button("🔍 Search All", type="primary"):
+        with st.spinner("🔍 Searching corpus..."):
+            results = corpus_search(
+                query,
+                top_k=10,
+                doc_hashes={names[name] for name in selected_names} or None,
+                deals=set(selected_deals) or None,
+                date_from=date_from
+            )
+        
+        if not results:
+            st.info("🔍 No results found. Try different search terms or filters.")
+        for result in results:
+            similarity_percentage = 100 / (1 + result['distance'])
+            deal_label = f" | {result['deal']}" if result['deal'] else ""
+            with st.expander(f"📄 {result['name']} - page {result['page']}{deal_label} ({similarity_percentage:.0f}% match)"):
+                st.caption(f"Processed {result['date']}")
+                st.write(result['text'][:500] + ("..." if len(result['text']) > 500 else ""))
 
 def show_semantic_search():
     """Semantic Search interface with PDF viewer"""
@@ -425,6 +619,16 @@ def show_semantic_search():
             st.metric("Pages", len(set(st.session_state.chunk_page_mapping)))
             st.metric("Chunks", len(st.session_state.text_chunks))
             st.metric("Words", len(st.session_state.cim_text.split()))
+            embed_stats = st.session_state.embed_stats
+            if embed_stats.get('chunks'):
+                st.caption(f"🧠 Embedded {embed_stats['chunks']:,} chunks in {embed_stats['seconds']:.1f}s "
+                           f"({embed_stats['chunks_per_sec']:.0f} chunks/s)")
+            search_stats = st.session_state.search_stats
+            if search_stats.get('cached'):
+                st.caption("⚡ Last search served from cache")
+            elif search_stats.get('total_ms'):
+                st.caption(f"⚡ Last search {search_stats['total_ms']:.0f} ms"
+                           + (" (re-ranked)" if search_stats.get('reranked') else ""))
     
     with col2:
         st.subheader("📄 PDF Viewer")
@@ -530,6 +734,8 @@ def show_semantic_search():
             """, unsafe_allow_html=True)
 
 def main():
+    sync_ingest_state()
+    
     # Main title
     st.markdown('<h1 class="main-title">Auctum Enterprise</h1>', unsafe_allow_html=True)
 
@@ -561,12 +767,13 @@ def main():
         
         # Performance settings
         st.header("⚡ Performance")
-        fast_mode = st.toggle("🚀 Fast Mode", value=True, help="Faster processing with fewer chunks")
+        fast_mode = st.toggle("🚀 Fast Mode", value=True, key="fast_mode",
+                              help="Chunk by paragraph instead of packing sentences into chunks")
         
         if fast_mode:
-            st.caption("✅ Optimized for speed")
+            st.caption("✅ Paragraph chunks, whole document indexed")
         else:
-            st.caption("🐌 Full processing (slower)")
+            st.caption("🐌 Sentence-packed chunks, whole document indexed")
         
         st.divider()
         
@@ -578,50 +785,30 @@ def main():
             help="Upload your CIM in PDF format"
         )
         
+        st.text_input("Deal name (optional)", key="deal_name",
+                      help="Tags the CIM so cross-document search can filter by deal")
+        
         if uploaded_file:
             if st.button("🔍 Process CIM", type="primary"):
-                with st.spinner("🔄 Processing CIM..."):
-                    # Store PDF file data for viewer
-                    st.session_state.pdf_file_data = uploaded_file.read()
-                    st.session_state.pdf_file_name = uploaded_file.name
-                    
-                    # Reset file pointer and extract text
-                    uploaded_file.seek(0)
-                    text, pdf_reader = extract_text_from_pdf(uploaded_file)
-                    
-                    if text:
-                        st.session_state.cim_text = text
-                        st.session_state.pdf_reader = pdf_reader  # Store PDF reader
-                        
-                        # Quick processing for faster loading
-                        fast_mode = st.session_state.get('fast_mode', True)
-                        
-                        if SEMANTIC_SEARCH_AVAILABLE:
-                            # Load model in background if needed
-                            if st.session_state.embed_model is None:
-                                with st.spinner("⚡ Loading AI model (one-time setup)..."):
-                                    st.session_state.embed_model = load_embedding_model()
-                            
-                            if st.session_state.embed_model:
-                                # Fast chunking and indexing
-                                chunks, _ = chunk_text(text, fast_mode=fast_mode)
-                                st.session_state.text_chunks = chunks
-                                
-                                # Simple page mapping
-                                page_mapping = map_chunks_to_pages(chunks, pdf_reader)
-                                st.session_state.chunk_page_mapping = page_mapping
-                                
-                                # Create index with limited chunks
-                                index, embeddings = create_semantic_index(chunks)
-                                st.session_state.semantic_index = index
-                                st.session_state.chunk_embeddings = embeddings
-                        
-                        # Quick success message
-                        semantic_status = "✅ Ready" if st.session_state.semantic_index else "❌ Unavailable"
-                        pdf_viewer_status = "✅ Ready" if PDF_VIEWER_AVAILABLE else "❌ Install needed"
-                        
-                        st.success(f"✅ Ready! Search: {semantic_status} | Viewer: {pdf_viewer_status}")
-                        st.rerun()
+                # Store PDF file data for viewer
+                pdf_bytes = uploaded_file.getvalue()
+                st.session_state.pdf_file_data = pdf_bytes
+                st.session_state.pdf_file_name = uploaded_file.name
+                st.session_state.pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+                
+                # Quick processing for faster loading
+                fast_mode = st.session_state.get('fast_mode', True)
+                
+                if SEMANTIC_SEARCH_AVAILABLE and st.session_state.embed_model is None:
+                    with st.spinner("⚡ Loading AI model (one-time setup)..."):
+                        st.session_state.embed_model = load_embedding_model()
+                
+                # Pages are extracted, chunked and indexed in the background
+                start_ingest(pdf_bytes, fast_mode=fast_mode, name=uploaded_file.name,
+                             deal=st.session_state.get('deal_name'))
+                st.rerun()
+    
+    show_ingest_progress()
     
     # Main content area
     if st.session_state.cim_text is None:
@@ -656,23 +843,47 @@ def main():
                 st.write(f"**PDF Viewer:** {pdf_status}")
     else:
         # Show semantic search interface
-        show_semantic_search()
+        tab_document, tab_corpus = st.tabs(["📄 This CIM", "🗂️ All CIMs"])
+        with tab_document:
+            show_semantic_search()
+        with tab_corpus:
+            show_corpus_search()
 
 if __name__ == "__main__":
     main()
 # Example function to add:
 
+def memo_context(cim_text, query_focus, max_tokens=DEFAULT_CONTEXT_TOKENS):
+    """Passages most relevant to the memo focus, packed into a token budget"""
+    spans = st.session_state.chunk_spans
+    results = []
+    if spans and st.session_state.semantic_index is not None:
+        results = semantic_search(query_focus, st.session_state.text_chunks, st.session_state.semantic_index, top_k=20)
+    passages = [(*spans[r['index']], r['similarity']) for r in results if r['index'] < len(spans)]
+    if not passages:
+        # Nothing indexed yet: the opening of the document, cut to the budget
+        passages = [(0, len(cim_text), 1.0)]
+    return pack_context(passages, cim_text, max_tokens, st.session_state.cim_document)
+
 def generate_investment_memo(cim_text, query_focus="business model"):
     """Generate an investment memo section using OpenAI"""
     if not cim_text or not openai.api_key:
         return "No CIM text loaded or API key not set."
 
+    # A map-reduce summary covers every page; retrieved excerpts add detail on the focus
+    context = memo_context(cim_text, query_focus, max_tokens=DEFAULT_CONTEXT_TOKENS // 2)
+    if st.session_state.cim_document is not None:
+        try:
+            summary = summarize_document(st.session_state.cim_document, openai.api_key, focus=query_focus)
+            context = f"Summary of the whole document:\n{summary}\n\nKey excerpts:\n{context}"
+        except Exception as e:
+            st.warning(f"Full-document summary unavailable, using excerpts only: {e}")
 
     prompt = f"""
     You are an investment analyst writing a short internal memo based on the following text:
 
     ---
-    {cim_text[:4000]}  # Truncate for token safety
+    {context}
     ---
 
     Write a 5-paragraph memo focused on: {query_focus}
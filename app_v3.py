@@ -10,6 +10,22 @@ import sqlite3
 import hashlib
 from datetime import datetime, timedelta
 import base64
+import threading
+
+from utils.storage import document_hash
+from utils.text_cache import get_text_cache
+from utils.ingest import BackgroundIngest
+from utils.document import PagedDocument
+from utils.bm25 import BM25Index, tokenize
+from utils.financial_terms import CONTEXT_CHARS, FinancialMentionIndex
+from utils.retrieval import hybrid_search
+from utils.context_packer import DEFAULT_CONTEXT_TOKENS, pack_context
+from utils.llm import stream_chat
+from utils.llm_cache import get_llm_cache, response_cache_key
+from utils.summarizer import summarize_document
+from utils.llm_scheduler import INTERACTIVE, get_scheduler
+from utils.openai_clients import connection_stats, get_client
+from utils.sections import SECTION_TREE_KEY, build_section_tree, format_section_list, section_texts
 
 # Page config
 st.set_page_config(
@@ -195,79 +211,38 @@ if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
 if 'cim_sections' not in st.session_state:
     st.session_state.cim_sections = {}
+if 'cim_section_tree' not in st.session_state:
+    st.session_state.cim_section_tree = None
 if 'current_filename' not in st.session_state:
     st.session_state.current_filename = None
 if 'text_chunks' not in st.session_state:
     st.session_state.text_chunks = []
 if 'debug_mode' not in st.session_state:
     st.session_state.debug_mode = False
+if 'doc_hash' not in st.session_state:
+    st.session_state.doc_hash = None
+if 'cim_document' not in st.session_state:
+    st.session_state.cim_document = None
+if 'bm25_index' not in st.session_state:
+    st.session_state.bm25_index = None
+if 'financial_index' not in st.session_state:
+    st.session_state.financial_index = None
+if 'financial_ranking' not in st.session_state:
+    st.session_state.financial_ranking = None
+if 'ingest_job' not in st.session_state:
+    st.session_state.ingest_job = None
+if 'ingest_synced' not in st.session_state:
+    st.session_state.ingest_synced = None
+if 'answer_cancel' not in st.session_state:
+    st.session_state.answer_cancel = None
 
 # PDF extraction and processing functions
-def extract_text_from_pdf(pdf_file):
-    """Extract text from PDF using PyPDF2"""
-    try:
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page_num, page in enumerate(pdf_reader.pages):
-            page_text = page.extract_text()
-            if page_text:
-                text += f"\n\n--- PAGE {page_num + 1} ---\n\n" + page_text
-        return text
-    except Exception as e:
-        st.error(f"Error reading PDF: {e}")
-        return None
-
-def extract_section_headers(text):
-    """Extract section headers from CIM text"""
-    patterns = [
-        r"(\d+\.?\d*\s+[A-Z][a-zA-Z\s&]+)(?=\n|\r)",
-        r"([A-Z][A-Z\s&]{10,}?)(?=\n|\r)",
-        r"^([A-Z][a-zA-Z\s&]{5,}?)(?=\n)",
-    ]
-    
-    headers = []
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.MULTILINE)
-        headers.extend([match.strip() for match in matches if len(match.strip()) > 5])
-    
-    headers = list(dict.fromkeys(headers))
-    
-    if not headers:
-        headers = [
-            "Executive Summary", "Business Overview", "Financial Performance", 
-            "Market Analysis", "Management Team", "Investment Highlights",
-            "Risk Factors", "Transaction Overview"
-        ]
-    
-    return headers[:15]
+def chunk_text(text, chunk_size=1500, overlap=300, offset=0, first_index=0):
+    """Split text into overlapping chunks for better context retrieval
 
-def split_text_by_sections(text, headers):
-    """Split text into sections based on headers"""
-    sections = {}
-    text_lower = text.lower()
-    
-    for i, header in enumerate(headers):
-        header_lower = header.lower()
-        start_pos = text_lower.find(header_lower)
-        
-        if start_pos != -1:
-            if i + 1 < len(headers):
-                next_header = headers[i + 1].lower()
-                end_pos = text_lower.find(next_header, start_pos + len(header_lower))
-                if end_pos == -1:
-                    end_pos = len(text)
-            else:
-                end_pos = len(text)
-            
-            section_text = text[start_pos:end_pos].strip()
-            sections[header] = section_text
-        else:
-            sections[header] = ""
-    
-    return sections
-
-def chunk_text(text, chunk_size=1500, overlap=300):
-    """Split text into overlapping chunks for better context retrieval"""
+    offset and first_index shift the recorded positions and indices, so text
+    chunked in batches lines up with the whole document.
+    """
     chunks = []
     start = 0
     
@@ -284,49 +259,166 @@ def chunk_text(text, chunk_size=1500, overlap=300):
         
         chunks.append({
             'text': chunk,
-            'start': start,
-            'end': end,
-            'index': len(chunks)
+            'start': offset + start,
+            'end': offset + end,
+            'index': first_index + len(chunks)
         })
         start = end - overlap
     
     return chunks
 
-def search_for_financial_terms(text):
-    """Search specifically for financial terms and amounts"""
-    financial_patterns = [
-        r'\$[\d,]+\.?\d*\s*(million|billion|thousand)?',
-        r'€[\d,]+\.?\d*\s*(million|billion|thousand)?',
-        r'[\d,]+\.?\d*\s*(million|billion|thousand)?\s*(USD|EUR|dollars|euros)',
-        r'revenue[s]?\s*:?\s*\$?€?[\d,]+',
-        r'profit[s]?\s*:?\s*\$?€?[\d,]+',
-        r'debt[s]?\s*:?\s*\$?€?[\d,]+',
-        r'financial\s+(?:details|information|data|metrics)',
-        r'senior\s+secured\s+credit\s+facilities',
+def chunk_page_batch(batch, bm25_index=None, financial_index=None):
+    """Chunk one ingest batch, record the page each chunk starts on and index its terms"""
+    chunks = chunk_text(batch['text'], offset=batch['offset'], first_index=batch['first_chunk'])
+    for chunk in chunks:
+        chunk['page'] = batch['document'].page_at(chunk['start'])
+    if bm25_index is not None:
+        bm25_index.add_documents([chunk['text'] for chunk in chunks])
+    if financial_index is not None:
+        # The batch's mentions cover its chunks, so each chunk is scored once here
+        financial_index.add_pages(batch['pages'], batch['offset'])
+        for chunk in chunks:
+            chunk['financial_score'] = financial_score(chunk, financial_index)
+    return chunks, [chunk['page'] for chunk in chunks], [(chunk['start'], chunk['end']) for chunk in chunks]
+
+# Text cache key of the chunks and search indexes built at ingest (depends on chunk_text's parameters)
+INGEST_CACHE_KEY = "ingest:2:1500:300"
+
+def cache_ingest(job, bm25_index, financial_index):
+    """on_complete: keep chunk spans, BM25 postings and financial mentions so a re-upload skips rebuilding them"""
+    get_text_cache().put_derived(job.doc_hash, INGEST_CACHE_KEY, {
+        'chunks': [[chunk['start'], chunk['end'], chunk['page'], chunk['financial_score']] for chunk in job.chunks],
+        'bm25': bm25_index.state(),
+        'financial_mentions': financial_index.mentions(),
+    })
+
+def load_cached_ingest(doc_hash):
+    """(document, chunks, bm25_index, financial_index) from the text cache, or None on a miss"""
+    cache = get_text_cache()
+    cached = cache.get_derived(doc_hash, INGEST_CACHE_KEY)
+    pages = cache.get_pages(doc_hash) if cached is not None else None
+    if pages is None:
+        return None
+    document = PagedDocument(pages)
+    text = document.text
+    chunks = [
+        {'text': text[start:end], 'start': start, 'end': end, 'index': i, 'page': page, 'financial_score': score}
+        for i, (start, end, page, score) in enumerate(cached['chunks'])
     ]
+    financial_index = FinancialMentionIndex()
+    financial_index.extend(tuple(mention) for mention in cached['financial_mentions'])
+    return document, chunks, BM25Index.from_state(cached['bm25']), financial_index
+
+def start_ingest(pdf_bytes, filename):
+    """Start streaming ingestion of a document in the background (or load it from the cache)"""
+    if st.session_state.ingest_job is not None:
+        st.session_state.ingest_job.cancel()
     
-    findings = []
-    for pattern in financial_patterns:
-        matches = re.finditer(pattern, text, re.IGNORECASE)
-        for match in matches:
-            start = max(0, match.start() - 200)
-            end = min(len(text), match.end() + 200)
-            context = text[start:end]
-            findings.append({
-                'match': match.group(),
-                'context': context,
-                'position': match.start()
-            })
-    
-    return findings
+    st.session_state.current_filename = filename
+    st.session_state.chat_history = []
+    doc_hash = document_hash(pdf_bytes)
+    cached = load_cached_ingest(doc_hash)
+    if cached is not None:
+        document, chunks, bm25_index, financial_index = cached
+        text = document.text
+        tree = get_text_cache().cached(doc_hash, SECTION_TREE_KEY, lambda: build_section_tree(text, document))
+        st.session_state.ingest_job = None
+        st.session_state.doc_hash = doc_hash
+        st.session_state.bm25_index = bm25_index
+        st.session_state.financial_index = financial_index
+        st.session_state.financial_ranking = rank_financial_chunks(chunks)
+        st.session_state.cim_text = text
+        st.session_state.cim_document = document
+        st.session_state.text_chunks = chunks
+        st.session_state.cim_section_tree = tree
+        st.session_state.cim_sections = section_texts(text, tree)
+        return
+    
+    bm25_index = BM25Index()
+    financial_index = FinancialMentionIndex()
+    job = BackgroundIngest(
+        pdf_bytes,
+        lambda batch: chunk_page_batch(batch, bm25_index, financial_index),
+        on_complete=lambda job: cache_ingest(job, bm25_index, financial_index)
+    ).start()
+    st.session_state.ingest_job = job
+    st.session_state.bm25_index = bm25_index
+    st.session_state.financial_index = financial_index
+    st.session_state.financial_ranking = None
+    st.session_state.ingest_synced = None
+    st.session_state.doc_hash = job.doc_hash
+    st.session_state.cim_text = ""
+    st.session_state.cim_document = job.document
+    st.session_state.text_chunks = job.chunks
+    st.session_state.cim_sections = {}
+    # None until the finished document's tree is loaded (an empty tree is a loaded tree)
+    st.session_state.cim_section_tree = None
+
+def sync_ingest_state():
+    """Point session state at everything the background ingest has processed so far"""
+    job = st.session_state.ingest_job
+    if job is None:
+        return
+    
+    st.session_state.cim_text = job.text
+    st.session_state.cim_document = job.document
+    st.session_state.text_chunks = job.chunks
+    
+    if job.done and st.session_state.financial_ranking is None:
+        st.session_state.financial_ranking = rank_financial_chunks(job.chunks)
+    
+    if job.done and st.session_state.cim_section_tree is None and job.text:
+        text, document = job.text, job.document
+        tree = get_text_cache().cached(job.doc_hash, SECTION_TREE_KEY, lambda: build_section_tree(text, document))
+        st.session_state.cim_section_tree = tree
+        st.session_state.cim_sections = section_texts(text, tree)
+    
+    st.session_state.ingest_synced = (job.batches_done > 0, job.done)
+
+@st.fragment(run_every=1.0)
+def show_ingest_progress():
+    """Progress bar for the background ingest; reruns the app when new content becomes usable"""
+    job = st.session_state.ingest_job
+    if job is None:
+        return
+    
+    if (job.batches_done > 0, job.done) != st.session_state.ingest_synced:
+        st.rerun()
+    
+    if job.error:
+        st.error(f"Error reading PDF: {job.error}")
+    elif not job.done:
+        total = job.total_pages or "?"
+        st.progress(job.progress, text=f"📥 Indexed {job.document.num_pages}/{total} pages - questions use the pages indexed so far")
+
+def build_financial_index(text):
+    """Financial mention index for a whole text (when none was built at ingest)"""
+    financial_index = FinancialMentionIndex()
+    financial_index.add_text(text)
+    return financial_index
 
-def find_relevant_chunks_advanced(query, chunks, text, top_k=5):
+def financial_score(chunk, financial_index):
+    """High score for chunks containing financial data, boosted by dollar and euro symbols"""
+    score = financial_index.count_in_range(chunk['start'], chunk['end']) * 10
+    return score + (chunk['text'].count('$') + chunk['text'].count('€')) * 3
+
+def rank_financial_chunks(chunks):
+    """Indices of the chunks with a financial score (computed at ingest), highest first"""
+    scored = [i for i, chunk in enumerate(chunks) if chunk['financial_score']]
+    return sorted(scored, key=lambda i: chunks[i]['financial_score'], reverse=True)
+
+def find_relevant_chunks_advanced(query, chunks, text, top_k=5, bm25_index=None, financial_index=None,
+                                  financial_ranking=None):
     """Advanced chunk finding with multiple strategies"""
     query_lower = query.lower()
-    scored_chunks = []
     
-    # Strategy 1: Direct keyword matching
-    keywords = set(query_lower.split())
+    if bm25_index is None:
+        bm25_index = BM25Index()
+        bm25_index.add_documents([chunk['text'] for chunk in chunks])
+    
+    # Strategy 1: Keyword relevance (BM25 over the inverted index built at ingest);
+    # the query goes through the index's own tokenizer, so "EBITDA?" matches "ebitda"
+    keywords = set(tokenize(query))
     financial_keywords = {'financial', 'finance', 'revenue', 'profit', 'debt', 'million', 'billion', 
                          'dollar', 'euro', 'usd', 'eur', 'credit', 'facilities', 'senior', 'secured'}
     
@@ -334,55 +426,59 @@ def find_relevant_chunks_advanced(query, chunks, text, top_k=5):
     if any(kw in query_lower for kw in ['financial', 'finance', 'money', 'revenue', 'profit']):
         keywords.update(financial_keywords)
     
-    # Strategy 2: Search for specific financial amounts if mentioned
-    financial_findings = search_for_financial_terms(text)
-    
-    for i, chunk in enumerate(chunks):
-        chunk_text_lower = chunk['text'].lower()
-        score = 0
-        
-        # Keyword matching score
-        for keyword in keywords:
-            score += chunk_text_lower.count(keyword) * 2
-        
-        # Financial pattern matching score
-        for finding in financial_findings:
-            if finding['position'] >= chunk['start'] and finding['position'] <= chunk['end']:
-                score += 10  # High score for chunks containing financial data
-        
-        # Boost score for chunks containing dollar or euro symbols
-        score += chunk['text'].count('$') * 3
-        score += chunk['text'].count('€') * 3
-        
-        scored_chunks.append((score, i, chunk))
-    
-    # Sort by score
-    scored_chunks.sort(key=lambda x: x[0], reverse=True)
-    
-    # Return top k chunks
-    return [chunk for _, _, chunk in scored_chunks[:top_k]]
+    def keyword_leg(query, k):
+        scores = bm25_index.score(keywords)
+        return [i for i in sorted(scores, key=scores.get, reverse=True)[:k] if i < len(chunks)]
+    
+    # Strategy 2: Financial mentions, scored per chunk at ingest and ranked once the ingest finishes
+    if financial_ranking is None:
+        if any('financial_score' not in chunk for chunk in chunks):
+            financial_index = financial_index or build_financial_index(text)
+            chunks = [{**chunk, 'financial_score': financial_score(chunk, financial_index)} for chunk in chunks]
+        financial_ranking = rank_financial_chunks(chunks)
+    
+    def financial_leg(query, k):
+        return financial_ranking[:k]
+    
+    # Both rankings run in parallel and are fused by rank, so neither score scale dominates
+    fused = hybrid_search(
+        query, {'keyword': keyword_leg, 'financial': financial_leg},
+        top_k=top_k, texts=[chunk['text'] for chunk in chunks]
+    )
+    
+    # Return top k chunks, topped up in document order when few chunks match at all
+    selected = [i for _, i in fused]
+    chosen = set(selected)
+    selected += [i for i in range(len(chunks)) if i not in chosen][:top_k - len(selected)]
+    return [chunks[i] for i in selected]
 
-def get_comprehensive_context(query, full_text, chunks):
-    """Get comprehensive context using multiple strategies"""
+def get_comprehensive_context(query, full_text, chunks, document=None, bm25_index=None, financial_index=None,
+                              max_tokens=DEFAULT_CONTEXT_TOKENS, financial_ranking=None):
+    """Get comprehensive context using multiple strategies, packed into a token budget"""
     query_lower = query.lower()
+    passages = []
     
     # First, try to find specific financial mentions
     if any(term in query_lower for term in ['financial', 'finance', 'money', 'revenue', 'debt', 'million']):
-        financial_findings = search_for_financial_terms(full_text)
-        if financial_findings:
-            # Create context from financial findings
-            context_parts = []
-            for finding in financial_findings[:5]:  # Top 5 financial mentions
-                context_parts.append(f"[Financial mention: {finding['match']}]\n{finding['context']}")
-            return "\n\n---\n\n".join(context_parts)
-    
-    # Otherwise, use chunk-based retrieval
-    relevant_chunks = find_relevant_chunks_advanced(query, chunks, full_text)
-    context_parts = [f"[Chunk {chunk['index']+1}]\n{chunk['text']}" for chunk in relevant_chunks]
-    
-    return "\n\n---\n\n".join(context_parts)
+        if financial_index is None:
+            financial_index = build_financial_index(full_text)
+        # More candidates than fit; the packer keeps the best and merges neighbours
+        for rank, (start, end, _) in enumerate(financial_index.top(25)):
+            passages.append((max(0, start - CONTEXT_CHARS), min(len(full_text), end + CONTEXT_CHARS), 1 / (rank + 1)))
+    
+    # Otherwise, use chunk-based retrieval (overlapping chunks are merged when packed)
+    if not passages:
+        relevant_chunks = find_relevant_chunks_advanced(
+            query, chunks, full_text, top_k=12, bm25_index=bm25_index, financial_index=financial_index,
+            financial_ranking=financial_ranking
+        )
+        passages = [(chunk['start'], chunk['end'], 1 / (rank + 1)) for rank, chunk in enumerate(relevant_chunks)]
+    
+    return pack_context(passages, full_text, max_tokens, document)
 
 def main():
+    sync_ingest_state()
+    
     # Main title
     st.markdown('<h1 class="main-title">Auctum</h1>', unsafe_allow_html=True)
     
@@ -426,35 +522,28 @@ def main():
         
         if uploaded_file and api_key:
             if st.button("🔍 Process Document", type="primary"):
-                with st.spinner("🔄 Processing document..."):
-                    text = extract_text_from_pdf(uploaded_file)
-                    if text:
-                        st.session_state.cim_text = text
-                        st.session_state.current_filename = uploaded_file.name
-                        st.session_state.chat_history = []
-                        
-                        # Extract sections
-                        headers = extract_section_headers(text)
-                        sections = split_text_by_sections(text, headers)
-                        st.session_state.cim_sections = sections
-                        
-                        # Create chunks
-                        chunks = chunk_text(text)
-                        st.session_state.text_chunks = chunks
-                        
-                        st.success(f"✅ Document processed! Extracted {len(text):,} characters")
-                        st.info(f"📊 Created {len(chunks)} searchable chunks")
-                        
-                        # Debug: Show sample of financial findings
-                        if st.session_state.debug_mode:
-                            financial_findings = search_for_financial_terms(text)
-                            if financial_findings:
-                                st.markdown("### 💰 Financial Terms Found:")
-                                for i, finding in enumerate(financial_findings[:5]):
-                                    st.markdown(f'<div class="debug-info">Match {i+1}: {finding["match"]}</div>', 
-                                              unsafe_allow_html=True)
-                        
-                        st.rerun()
+                start_ingest(uploaded_file.getvalue(), uploaded_file.name)
+                st.rerun()
+        
+        # Debug: Show sample of financial findings
+        job = st.session_state.ingest_job
+        if st.session_state.debug_mode and (job is None or job.done) and st.session_state.financial_index:
+            mentions = st.session_state.financial_index.top(5)
+            if mentions:
+                st.markdown("### 💰 Financial Terms Found:")
+                for i, (start, end, _) in enumerate(mentions):
+                    st.markdown(f'<div class="debug-info">Match {i+1}: {st.session_state.cim_text[start:end]}</div>', 
+                              unsafe_allow_html=True)
+        
+        # Debug: Show how often OpenAI connections are reused
+        if st.session_state.debug_mode and api_key:
+            stats = connection_stats(api_key)
+            if stats['requests']:
+                st.markdown(f'<div class="debug-info">🔌 OpenAI: {stats["requests"]} requests over '
+                            f'{stats["connections"]} connections ({stats["reuse_rate"]:.0%} reused)</div>',
+                            unsafe_allow_html=True)
+    
+    show_ingest_progress()
     
     # Main content area
     if st.session_state.cim_text is None:
@@ -484,6 +573,49 @@ def main():
         # Show chat interface
         show_chat_interface(api_key)
 
+def stream_answer(api_key, system_message, context, full_prompt, max_tokens):
+    """Stream an answer into the current container and return its full text
+
+    A stream still running for this session (an earlier question) is
+    cancelled first. full_prompt is the user message built around context;
+    answers already given for the same model, prompt and context come from
+    the response cache without calling the API.
+    """
+    if st.session_state.answer_cancel is not None:
+        st.session_state.answer_cancel.set()
+    cancel = threading.Event()
+    st.session_state.answer_cancel = cancel
+    
+    model = "gpt-4-turbo-preview" if "gpt-4" in api_key else "gpt-3.5-turbo-16k"
+    temperature = 0.3  # Lower temperature for more focused answers
+    cache = get_llm_cache()
+    cache_key = response_cache_key(model, system_message, context, full_prompt, temperature, max_tokens=max_tokens)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        st.write(cached)
+        return cached
+    
+    client = get_client(api_key)
+    answer = st.write_stream(stream_chat(
+        client,
+        model,
+        [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": full_prompt}
+        ],
+        cancel_event=cancel,
+        scheduler=get_scheduler(api_key),
+        priority=INTERACTIVE,
+        max_tokens=max_tokens,
+        temperature=temperature
+    ))
+    answer = answer if isinstance(answer, str) else "".join(map(str, answer))
+    
+    # A cancelled stream is partial; only complete answers are reused
+    if not cancel.is_set():
+        cache.put(cache_key, model, answer)
+    return answer
+
 def show_chat_interface(api_key):
     """Interactive chat interface"""
     st.subheader("💬 Document Analysis Chat")
@@ -502,24 +634,23 @@ def show_chat_interface(api_key):
     # Chat input
     if prompt := st.chat_input("Ask a question about this document..."):
         if api_key:
-            # Add user message to chat history
-            st.session_state.chat_history.append((prompt, ""))
-            
             # Display user message
             with st.chat_message("user"):
                 st.write(prompt)
             
             # Generate and display assistant response
             with st.chat_message("assistant"):
-                with st.spinner("🔄 Searching entire document..."):
-                    try:
-                        client = openai.OpenAI(api_key=api_key)
-                        
+                try:
+                    with st.spinner("🔄 Searching entire document..."):
                         # Get comprehensive context
                         context = get_comprehensive_context(
                             prompt, 
                             st.session_state.cim_text,
-                            st.session_state.text_chunks
+                            st.session_state.text_chunks,
+                            st.session_state.cim_document,
+                            st.session_state.bm25_index,
+                            st.session_state.financial_index,
+                            financial_ranking=st.session_state.financial_ranking
                         )
                         
                         # Debug: Show what context we're sending
@@ -542,28 +673,18 @@ Document Excerpts:
 User Question: {prompt}
 
 Please provide a specific answer based on the excerpts above. If you find financial figures, cite them exactly."""
-                        
-                        response = client.chat.completions.create(
-                            model="gpt-4-turbo-preview" if "gpt-4" in api_key else "gpt-3.5-turbo-16k",
-                            messages=[
-                                {"role": "system", "content": system_message},
-                                {"role": "user", "content": full_prompt}
-                            ],
-                            max_tokens=1000,
-                            temperature=0.3  # Lower temperature for more focused answers
-                        )
-                        
-                        answer = response.choices[0].message.content
-                        st.write(answer)
-                        
-                        # Update chat history
-                        st.session_state.chat_history[-1] = (prompt, answer)
-                        
-                    except Exception as e:
-                        st.error(f"Error: {e}")
-                        if st.session_state.debug_mode:
-                            st.exception(e)
-                        st.session_state.chat_history[-1] = (prompt, f"Error: {e}")
+                    
+                    # Tokens appear as they are generated
+                    answer = stream_answer(api_key, system_message, context, full_prompt, max_tokens=1000)
+                    
+                    # Update chat history once the answer is complete
+                    st.session_state.chat_history.append((prompt, answer))
+                    
+                except Exception as e:
+                    st.error(f"Error: {e}")
+                    if st.session_state.debug_mode:
+                        st.exception(e)
+                    st.session_state.chat_history.append((prompt, f"Error: {e}"))
         else:
             st.warning("⚠️ Please enter your OpenAI API key to use the chat feature")
     
@@ -574,8 +695,7 @@ Please provide a specific answer based on the excerpts above. If you find financ
     with col1:
         if st.button("📊 Summarize", use_container_width=True):
             if api_key:
-                prompt = "Provide a comprehensive summary of this document"
-                process_quick_action(prompt, api_key)
+                summarize_whole_document(api_key)
     
     with col2:
         if st.button("💰 Find Financials", use_container_width=True):
@@ -591,20 +711,39 @@ Please provide a specific answer based on the excerpts above. If you find financ
     
     with col4:
         if st.button("📋 List Sections", use_container_width=True):
-            if st.session_state.cim_sections:
-                sections_list = "\n".join([f"• {section}" for section in st.session_state.cim_sections.keys()])
+            if st.session_state.cim_section_tree:
+                sections_list = format_section_list(st.session_state.cim_section_tree)
                 st.session_state.chat_history.append(("List all sections", f"Document sections:\n\n{sections_list}"))
                 st.rerun()
 
+def summarize_whole_document(api_key):
+    """Summarize every page (map-reduce over the whole document) into the chat history"""
+    prompt = "Provide a comprehensive summary of this document"
+    document = st.session_state.cim_document
+    if document is None:
+        return
+    
+    try:
+        with st.spinner(f"🔄 Summarizing all {document.num_pages} pages..."):
+            answer = summarize_document(
+                document, api_key,
+                model="gpt-4-turbo-preview" if "gpt-4" in api_key else "gpt-3.5-turbo-16k"
+            )
+        st.session_state.chat_history.append((prompt, answer))
+    except Exception as e:
+        st.error(f"Error: {e}")
+        st.session_state.chat_history.append((prompt, f"Error: {e}"))
+    st.rerun()
+
 def process_quick_action(prompt, api_key):
     """Process quick action buttons"""
-    st.session_state.chat_history.append((prompt, ""))
-    
     try:
-        client = openai.OpenAI(api_key=api_key)
-        
         # Get comprehensive context
-        context = get_comprehensive_context(prompt, st.session_state.cim_text, st.session_state.text_chunks)
+        context = get_comprehensive_context(
+            prompt, st.session_state.cim_text, st.session_state.text_chunks,
+            st.session_state.cim_document, st.session_state.bm25_index,
+            st.session_state.financial_index, financial_ranking=st.session_state.financial_ranking
+        )
         
         system_message = """You are an expert document analyst. Provide detailed, accurate answers based on the document content."""
         
@@ -615,23 +754,18 @@ Request: {prompt}
 
 Please provide a comprehensive answer based on the document excerpts above."""
         
-        response = client.chat.completions.create(
-            model="gpt-4-turbo-preview" if "gpt-4" in api_key else "gpt-3.5-turbo-16k",
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": full_prompt}
-            ],
-            max_tokens=1500,
-            temperature=0.3
-        )
+        with st.chat_message("user"):
+            st.write(prompt)
+        with st.chat_message("assistant"):
+            answer = stream_answer(api_key, system_message, context, full_prompt, max_tokens=1500)
         
-        answer = response.choices[0].message.content
-        st.session_state.chat_history[-1] = (prompt, answer)
+        # Into the history once complete; the rerun shows it in order
+        st.session_state.chat_history.append((prompt, answer))
         st.rerun()
         
     except Exception as e:
         st.error(f"Error: {e}")
-        st.session_state.chat_history[-1] = (prompt, f"Error: {e}")
+        st.session_state.chat_history.append((prompt, f"Error: {e}"))
         st.rerun()
 
 if __name__ == "__main__":
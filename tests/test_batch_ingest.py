@@ -0,0 +1,57 @@
+import pytest
+
+pytest.importorskip("PyPDF2")
+
+from tests.test_pdf_extraction import make_pdf
+from utils import text_cache
+from utils.batch_ingest import ingest_file, ingest_paths, is_ingested
+from utils.storage import document_hash
+from utils.text_cache import TextCache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    # Worker processes are forked, so they see the same cache directory
+    (tmp_path / "text_cache").mkdir()
+    cache = TextCache(str(tmp_path / "text_cache"))
+    monkeypatch.setattr(text_cache, "_text_cache", cache)
+    return cache
+
+
+def write_pdf(path, num_pages):
+    path.write_bytes(make_pdf(num_pages))
+    return str(path)
+
+
+def test_ingested_files_are_skipped_unless_forced(tmp_path, cache):
+    path = write_pdf(tmp_path / "a.pdf", 3)
+    first = ingest_file(path, embed=False)
+    assert (first['status'], first['pages']) == ("ok", 3)
+    assert is_ingested(first['doc_hash'], 'fast', embed=False)
+    assert ingest_file(path, embed=False)['status'] == "skipped"
+    assert ingest_file(path, embed=False, force=True)['status'] == "ok"
+
+
+def test_interrupted_file_is_finished_on_the_next_run(tmp_path, cache):
+    path = write_pdf(tmp_path / "a.pdf", 2)
+    doc_hash = document_hash(make_pdf(2))
+    # Stopped after the pages were cached but before the section tree was
+    cache.put_pages(doc_hash, ["Page 1", "Page 2"])
+    assert not is_ingested(doc_hash, 'fast', embed=False)
+    assert ingest_file(path, embed=False)['status'] == "ok"
+    assert is_ingested(doc_hash, 'fast', embed=False)
+
+
+def test_duplicate_content_is_processed_once(tmp_path, cache):
+    original = write_pdf(tmp_path / "a.pdf", 2)
+    copy = write_pdf(tmp_path / "b.pdf", 2)
+    other = write_pdf(tmp_path / "c.pdf", 4)
+    seen = []
+    results = ingest_paths([original, copy, other], workers=2, embed=False, on_result=seen.append)
+    by_path = {result['path']: result for result in results}
+    assert by_path[copy] == {'path': copy, 'doc_hash': document_hash(make_pdf(2)),
+                             'status': 'duplicate', 'of': original}
+    assert by_path[original]['status'] == by_path[other]['status'] == "ok"
+    assert len(seen) == 3
+
+    assert {result['status'] for result in ingest_paths([original, other], embed=False)} == {"skipped"}
@@ -0,0 +1,25 @@
+from utils.bm25 import BM25Index, tokenize
+
+
+def build(texts):
+    index = BM25Index()
+    index.add_documents(texts)
+    return index
+
+
+def test_tokenize_strips_punctuation_and_plurals():
+    assert tokenize("Revenues grew; EBITDA?") == ["revenue", "grew", "ebitda"]
+
+
+def test_state_round_trip_scores_identically():
+    index = build(["Revenue was $10 million", "EBITDA margin expanded", "revenue and EBITDA both grew"])
+    restored = BM25Index.from_state(index.state())
+    assert len(restored) == len(index)
+    assert restored.score(["revenue", "ebitda"]) == index.score(["revenue", "ebitda"])
+    assert restored.top_k("ebitda margin", 2) == index.top_k("ebitda margin", 2)
+
+
+def test_punctuated_query_terms_match_postings():
+    index = build(["The company reported EBITDA of $4 million.", "Headcount was stable."])
+    scores = index.score(tokenize("What was the EBITDA?"))
+    assert max(scores, key=scores.get) == 0
@@ -0,0 +1,45 @@
+from utils.chunking import chunk_text, map_chunks_to_pages, split_span
+from utils.document import PagedDocument
+
+
+def words(n, prefix="w"):
+    return " ".join(f"{prefix}{i}" for i in range(n))
+
+
+def test_fast_mode_windows_long_paragraphs():
+    page = words(600)
+    document = PagedDocument(["Short intro paragraph.\n\n" + page, "Second page."])
+    chunks, spans = chunk_text(document.text, max_chars=1000)
+
+    assert all(len(chunk) <= 1000 for chunk in chunks)
+    assert all(document.text[start:end] == chunk for chunk, (start, end) in zip(chunks, spans))
+    # Every word of the long paragraph is inside some window
+    covered = set()
+    for chunk in chunks:
+        covered.update(chunk.split())
+    assert set(page.split()) <= covered
+    assert map_chunks_to_pages(spans, document)[-1] == 2
+
+
+def test_offset_is_added_to_spans():
+    text = words(400)
+    _, spans = chunk_text(text, offset=5000, max_chars=500)
+    assert spans[0][0] == 5000
+    assert spans[-1][1] == 5000 + len(text)
+
+
+def test_full_mode_caps_long_sentences():
+    text = words(500) + ". Short one."
+    chunks, spans = chunk_text(text, fast_mode=False, max_chars=800)
+    assert all(len(chunk) <= 800 for chunk in chunks)
+    assert spans[-1][1] == len(text)
+
+
+def test_split_span_breaks_at_whitespace_and_overlaps():
+    text = words(300)
+    windows = split_span(text, 0, len(text), max_chars=200, overlap=40)
+    for (start, end), (next_start, _) in zip(windows, windows[1:]):
+        assert end - start <= 200
+        assert text[end] == " "
+        assert next_start < end
+        assert text[next_start - 1] == " "
@@ -0,0 +1,19 @@
+from utils.context_packer import count_tokens, merge_passages, pack_context
+from utils.document import PagedDocument
+
+
+def test_merge_passages_joins_overlaps_and_keeps_best_score():
+    assert merge_passages([(10, 20, 0.1), (0, 12, 0.5), (40, 50, 0.2)]) == [(0, 20, 0.5), (40, 50, 0.2)]
+
+
+def test_pack_context_stays_within_budget_in_document_order():
+    document = PagedDocument([f"page {i} " + "word " * 200 for i in range(10)])
+    # The first 400 characters of every page, page 1 ranked best
+    passages = [(document.page_offsets(page)[0], document.page_offsets(page)[0] + 400, 1 / page)
+                for page in range(1, 11)]
+    stats = {}
+    context = pack_context(passages, document.text, max_tokens=600, document=document, stats=stats)
+
+    assert count_tokens(context) <= 600 + stats['packed']
+    assert context.startswith("[Page 1]")
+    assert 0 < stats['packed'] < 10
@@ -0,0 +1,51 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("faiss")
+
+from utils.corpus_index import CorpusIndex
+
+
+def add(corpus, doc_hash, rows, seed):
+    embeddings = np.random.default_rng(seed).random((rows, 8), dtype=np.float32)
+    corpus.add_document(doc_hash, doc_hash, embeddings, [1] * rows, [(i, i + 1) for i in range(rows)])
+    return embeddings
+
+
+def test_appends_without_rewriting_the_index_file(tmp_path):
+    writer = CorpusIndex("model", directory=str(tmp_path))
+    first = add(writer, "a", 10, 0)
+    index_mtime = (tmp_path / "vectors.faiss").stat().st_mtime_ns
+
+    reader = CorpusIndex("model", directory=str(tmp_path))
+    assert reader.has_document("a")
+
+    add(writer, "b", 10, 1)
+    assert (tmp_path / "vectors.faiss").stat().st_mtime_ns == index_mtime
+    assert reader.has_document("b")
+    assert reader.index.ntotal == 20
+    assert len(reader.table) == 20
+
+    [hit] = reader.search(first[3], top_k=1, doc_hashes={"a"})
+    assert (hit['doc_hash'], hit['chunk']) == ("a", 3)
+
+
+def test_duplicate_document_is_skipped(tmp_path):
+    corpus = CorpusIndex("model", directory=str(tmp_path))
+    add(corpus, "a", 5, 0)
+    assert not corpus.add_document("a", "a", np.zeros((5, 8), dtype=np.float32), [1] * 5)
+    assert len(corpus.table) == 5
+
+
+@pytest.mark.parametrize("config", [
+    {'flat_max': 5, 'hnsw_max': 10, 'ivf_flat_max': 20},
+    {'flat_max': 5, 'hnsw_max': 10, 'quantization': 'pq'},
+])
+def test_growing_within_a_kind_does_not_rebuild(tmp_path, config):
+    corpus = CorpusIndex("model", directory=str(tmp_path), config=config)
+    add(corpus, "a", 300, 0)
+    index = corpus.index
+    add(corpus, "b", 10, 1)
+    assert corpus.index is index
+    assert corpus.trained_on == 300
+    assert corpus.index.ntotal == 310
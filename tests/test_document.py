@@ -0,0 +1,32 @@
+import threading
+
+from utils.document import PAGE_SEPARATOR, PagedDocument
+
+
+def test_page_offsets_and_lookup():
+    document = PagedDocument(["alpha", "", "beta"])
+    assert document.text == "alpha" + PAGE_SEPARATOR + "beta" + PAGE_SEPARATOR
+    start, end = document.page_offsets(3)
+    assert document.text[start:end] == "beta"
+    assert document.page_at(start) == 3
+    assert document.slice(start, end) == "beta"
+
+
+def test_text_read_during_extend_is_never_stale():
+    document = PagedDocument()
+    pages = [f"page {i} " * 50 for i in range(2000)]
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            document.text
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    try:
+        for i in range(0, len(pages), 8):
+            document.extend(pages[i:i + 8])
+    finally:
+        stop.set()
+        thread.join()
+    assert document.text == "".join(page + PAGE_SEPARATOR for page in pages)
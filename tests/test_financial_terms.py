@@ -0,0 +1,17 @@
+from utils.financial_terms import FinancialMentionIndex, scan_financial_terms
+
+
+def test_mentions_round_trip():
+    index = FinancialMentionIndex()
+    index.add_pages(["Revenue: $12,500 in 2023", "", "Debt: 40 million USD"])
+    restored = FinancialMentionIndex()
+    restored.extend(tuple(mention) for mention in index.mentions())
+    assert restored.mentions() == index.mentions()
+    assert restored.top(10) == index.top(10)
+
+
+def test_scan_reports_whole_document_offsets():
+    text = "Sales of $5 million"
+    [(start, end, kind)] = scan_financial_terms(text, offset=100)
+    assert text[start - 100:end - 100] == "$5 million"
+    assert kind == 0
@@ -0,0 +1,32 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+faiss = pytest.importorskip("faiss")
+
+from utils.index_store import IndexStore
+
+
+def save(store, doc_hash):
+    embeddings = np.random.default_rng(0).random((4, 8), dtype=np.float32)
+    index = faiss.IndexFlatL2(8)
+    index.add(embeddings)
+    store.save(doc_hash, "model", index, embeddings, ["a", "b", "c", "d"], [1, 1, 2, 2], [(0, 1)] * 4, "fast")
+
+
+def test_save_load_round_trip(tmp_path):
+    store = IndexStore(directory=str(tmp_path))
+    assert store.load("doc", "model", "fast") is None
+    save(store, "doc")
+    stored = store.load("doc", "model", "fast")
+    assert stored.chunks == ["a", "b", "c", "d"] and stored.chunk_pages == [1, 1, 2, 2]
+    assert stored.index.ntotal == 4 and stored.embeddings.shape == (4, 8)
+
+
+def test_loaded_indexes_are_bounded(tmp_path):
+    store = IndexStore(directory=str(tmp_path), max_loaded=2)
+    for doc_hash in ["a", "b", "c"]:
+        save(store, doc_hash)
+        store.load(doc_hash, "model", "fast")
+    assert len(store._loaded) == 2
+    first = store.load("c", "model", "fast")
+    assert store.load("c", "model", "fast") is first
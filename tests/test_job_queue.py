@@ -0,0 +1,100 @@
+import sqlite3
+
+import utils.job_queue as job_queue
+from utils.job_queue import JobQueue
+
+
+def make_queue(tmp_path):
+    return JobQueue(path=str(tmp_path / "jobs.sqlite"))
+
+
+def test_active_job_is_shared_and_key_erased_on_claim(tmp_path):
+    queue = make_queue(tmp_path)
+    first = queue.submit("cim", {'path': "a.pdf"}, doc_hash="h", api_key="sk-1")
+    assert queue.submit("cim", {'path': "a.pdf"}, doc_hash="h") == first
+    assert queue.submit("cim", {'path': "a.pdf", 'deal': "x"}, doc_hash="h") != first
+
+    job, api_key = queue.claim()
+    assert (job['id'], job['status'], api_key) == (first, "running", "sk-1")
+    queue.finish(first, result={'doc_hash': "h"})
+    # Re-running the same row (e.g. after a lost lease) would find no key
+    with queue._connect() as conn:
+        assert conn.execute("SELECT api_key FROM jobs WHERE id = ?", (first,)).fetchone()[0] is None
+
+
+def test_done_jobs_are_reused_only_without_analysis_errors(tmp_path):
+    queue = make_queue(tmp_path)
+    payload = {'path': "a.pdf"}
+    partial = queue.submit("cim", payload, doc_hash="h")
+    queue.claim()
+    queue.finish(partial, result={'analysis_errors': {'red_flags': "429 Too Many Requests"}})
+
+    retry = queue.submit("cim", payload, doc_hash="h")
+    assert retry != partial
+    queue.claim()
+    queue.finish(retry, result={'analysis_errors': {}})
+
+    assert queue.submit("cim", payload, doc_hash="h") == retry
+    assert queue.submit("cim", payload, doc_hash="h", reuse_done=False) != retry
+
+
+def test_expired_lease_requeues_then_fails(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, "LEASE_SECONDS", -1)
+    queue = make_queue(tmp_path)
+    job_id = queue.submit("cim", {}, doc_hash="h")
+    attempts = []
+    while True:
+        job, _ = queue.claim()
+        if job is None:
+            break
+        attempts.append(job['attempts'])
+    assert attempts == list(range(1, job_queue.MAX_ATTEMPTS + 1))
+    assert queue.get(job_id)['status'] == "failed"
+
+
+def test_cancelled_job_ignores_late_result(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.submit("cim", {}, doc_hash="h")
+    queue.claim()
+    queue.cancel(job_id)
+    queue.finish(job_id, result={'doc_hash': "h"})
+    assert queue.get(job_id)['status'] == "cancelled"
+    assert queue.submit("cim", {}, doc_hash="h") != job_id
+
+
+def test_only_one_worker_pool_is_spawned(tmp_path):
+    queue = make_queue(tmp_path)
+    assert queue.claim_spawn()
+    assert not queue.claim_spawn()
+
+
+def test_slow_starting_pool_is_not_spawned_again(tmp_path, monkeypatch):
+    queue = make_queue(tmp_path)
+    now = [1000.0]
+    monkeypatch.setattr(job_queue.time, "time", lambda: now[0])
+    assert queue.claim_spawn()
+    # Still loading after WORKER_TIMEOUT, without a check-in yet
+    now[0] += job_queue.WORKER_TIMEOUT + 1
+    assert not queue.claim_spawn()
+    # Checked in, then went quiet: the pool is dead
+    queue.heartbeat()
+    now[0] += job_queue.WORKER_TIMEOUT + 1
+    assert queue.claim_spawn()
+    # A pool that never checks in is given up on after STARTUP_TIMEOUT
+    now[0] += job_queue.STARTUP_TIMEOUT + 1
+    assert queue.claim_spawn()
+
+
+def test_erased_key_leaves_no_copy_on_disk(tmp_path):
+    queue = make_queue(tmp_path)
+    # Another process's connection keeps the WAL from being removed on close
+    other = sqlite3.connect(queue.path)
+    other.execute("SELECT COUNT(*) FROM jobs").fetchone()
+    secret = b"sk-test-0123456789abcdef"
+    queued = queue.submit("cim", {}, doc_hash="a", api_key=secret.decode())
+    cancelled = queue.submit("cim", {}, doc_hash="b", api_key=secret.decode() + "-2")
+    assert queue.claim()[0]['id'] == queued
+    queue.cancel(cancelled)
+    for path in tmp_path.iterdir():
+        assert secret not in path.read_bytes()
+    other.close()
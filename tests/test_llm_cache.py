@@ -0,0 +1,45 @@
+from utils import llm_cache
+from utils.llm_cache import LLMResponseCache, response_cache_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(tmp_path, monkeypatch, **kwargs):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache.time, "time", clock)
+    return LLMResponseCache(path=str(tmp_path / "responses.sqlite"), **kwargs), clock
+
+
+def test_key_covers_every_setting():
+    key = response_cache_key("gpt", "system", "context", "prompt", 0.2)
+    assert key == response_cache_key("gpt", "system", "context", "prompt", 0.2)
+    assert key != response_cache_key("gpt", "system", "context", "prompt", 0.3)
+    assert key != response_cache_key("gpt", "system", "context", "prompt", 0.2, max_tokens=10)
+
+
+def test_entries_expire_after_the_ttl(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch, ttl_seconds=60)
+    cache.put("a", "gpt", "answer")
+    clock.now += 59
+    assert cache.get("a") == "answer"
+    clock.now += 2
+    assert cache.get("a") is None
+
+
+def test_least_recently_used_entry_is_evicted_over_the_size_limit(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch, max_bytes=25)
+    cache.put("a", "gpt", "a" * 10)
+    clock.now += 1
+    cache.put("b", "gpt", "b" * 10)
+    clock.now += 1
+    assert cache.get("a") == "a" * 10
+    clock.now += 1
+    # Only two 10-byte responses fit, and "b" is the one not read since it was written
+    cache.put("c", "gpt", "c" * 10)
+    assert [cache.get(key) for key in "abc"] == ["a" * 10, None, "c" * 10]
@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+from utils import llm_scheduler
+from utils.llm_scheduler import BATCH, INTERACTIVE, RequestScheduler, TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_refills_at_its_rate(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_scheduler.time, "monotonic", clock)
+    bucket = TokenBucket(10, 2)
+    bucket.consume(10)
+    assert bucket.wait_time(4) == pytest.approx(2.0)
+    clock.now += 1
+    assert bucket.wait_time(4) == pytest.approx(1.0)
+    clock.now += 100
+    assert bucket.wait_time(4) == 0
+    assert bucket.level == pytest.approx(10)
+
+
+def test_request_above_capacity_waits_for_a_full_bucket(monkeypatch):
+    monkeypatch.setattr(llm_scheduler.time, "monotonic", Clock())
+    bucket = TokenBucket(10, 5)
+    bucket.consume(4)
+    assert bucket.wait_time(50) == pytest.approx(0.8)
+    bucket.consume(50)
+    assert bucket.level == pytest.approx(-4)
+
+
+def test_interactive_requests_jump_the_batch_lane():
+    scheduler = RequestScheduler(rpm=600, tpm=1_000_000)
+    scheduler.requests.level = 0
+    order = []
+
+    def request(name, priority):
+        scheduler.acquire(1, priority)
+        order.append(name)
+
+    batch = threading.Thread(target=request, args=("batch", BATCH))
+    batch.start()
+    time.sleep(0.02)
+    interactive = threading.Thread(target=request, args=("interactive", INTERACTIVE))
+    interactive.start()
+    batch.join(5)
+    interactive.join(5)
+    assert order == ["interactive", "batch"]
+    assert scheduler.stats['granted'] == 2
+
+
+def test_pause_holds_every_request():
+    scheduler = RequestScheduler(rpm=600, tpm=1_000_000)
+    scheduler.pause(0.2)
+    started = time.monotonic()
+    scheduler.acquire(1, INTERACTIVE)
+    assert time.monotonic() - started >= 0.19
+    assert scheduler.stats['rate_limited'] == 1
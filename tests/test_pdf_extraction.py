@@ -0,0 +1,57 @@
+import glob
+import os
+import tempfile
+
+import pytest
+
+pytest.importorskip("PyPDF2")
+
+from utils.pdf_extraction import extract_pages, iter_page_batches, split_page_range
+
+
+def make_pdf(num_pages):
+    """A minimal PDF whose page i shows the text 'Page i'"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for i in range(1, num_pages + 1):
+        content = f"BT /F1 12 Tf 72 720 Td (Page {i}) Tj ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>".encode())
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {num_pages} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def spilled_files():
+    return glob.glob(os.path.join(tempfile.gettempdir(), "auctum-extract-*"))
+
+
+def test_split_page_range_covers_every_page():
+    ranges = split_page_range(10, 4)
+    assert ranges[0][0] == 0 and ranges[-1][1] == 10
+    assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+
+
+def test_parallel_extraction_matches_serial_and_cleans_up():
+    pdf_bytes = make_pdf(20)
+    before = set(spilled_files())
+    serial = extract_pages(pdf_bytes, max_workers=1)
+    assert [page.strip() for page in serial] == [f"Page {i}" for i in range(1, 21)]
+    assert extract_pages(pdf_bytes, max_workers=2) == serial
+
+    batches = list(iter_page_batches(pdf_bytes, batch_pages=8, max_workers=2))
+    assert [start for start, _ in batches] == [0, 8, 16]
+    assert [page for _, pages in batches for page in pages] == serial
+    assert set(spilled_files()) == before
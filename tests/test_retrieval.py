@@ -0,0 +1,35 @@
+import time
+
+from utils.retrieval import hybrid_search, reciprocal_rank_fusion, search_complete
+
+
+def test_rrf_prefers_ids_ranked_high_by_every_leg():
+    fused = reciprocal_rank_fusion({'bm25': [1, 2, 3], 'vector': [2, 1, 4]}, 60, {})
+    assert [doc_id for _, doc_id in fused][:2] in ([1, 2], [2, 1])
+    assert {doc_id for _, doc_id in fused} == {1, 2, 3, 4}
+
+
+def test_complete_search_is_cacheable():
+    stats = {}
+    hybrid_search("q", {'bm25': lambda query, k: [0, 1]}, top_k=2, stats=stats)
+    assert search_complete(stats)
+
+
+def test_slow_or_failing_legs_make_results_uncacheable():
+    def slow(query, k):
+        time.sleep(0.5)
+        return [0]
+
+    def broken(query, k):
+        raise RuntimeError("model not loaded")
+
+    stats = {}
+    results = hybrid_search("q", {'bm25': lambda query, k: [1], 'vector': slow}, top_k=2,
+                            config={'search_budget_ms': 50}, stats=stats)
+    assert [doc_id for _, doc_id in results] == [1]
+    assert stats['timed_out'] == ['vector']
+    assert not search_complete(stats)
+
+    stats = {}
+    hybrid_search("q", {'bm25': lambda query, k: [1], 'vector': broken}, top_k=2, stats=stats)
+    assert not search_complete(stats)
@@ -0,0 +1,54 @@
+from utils.document import PagedDocument
+from utils.sections import build_section_tree, scan_headers, section_text, section_texts
+
+BODY = "The company grew revenue steadily across every region and segment.\n"
+
+TOC_DOCUMENT = (
+    "TABLE OF CONTENTS\n"
+    "1. Executive Summary\n"
+    "2. Financial Overview\n"
+    "2.1 Revenue Detail\n"
+    "\n"
+    "1. Executive Summary\n" + BODY * 3 +
+    "2. Financial Overview\n" + BODY * 3 +
+    "2.1 Revenue Detail\n" + BODY * 3
+)
+
+
+def by_title(sections):
+    return {section['title']: section for section in sections}
+
+
+def test_repeated_titles_keep_the_header_with_body_text_not_the_toc_line():
+    sections = by_title(build_section_tree(TOC_DOCUMENT))
+    body_start = TOC_DOCUMENT.index("\n\n") + 2
+
+    summary = sections["1. Executive Summary"]
+    assert summary['start'] >= body_start
+    assert section_text(TOC_DOCUMENT, summary).startswith("1. Executive Summary\nThe company")
+
+    detail = sections["2.1 Revenue Detail"]
+    overview = sections["2. Financial Overview"]
+    assert detail['start'] >= body_start
+    assert detail['parent'] == overview['index']
+    assert overview['start'] >= body_start
+
+
+def test_repeated_title_without_any_body_keeps_the_last_occurrence():
+    text = "Company Overview\nCompany Overview\n"
+    [(start, title, _)] = scan_headers(text)
+    assert (start, title) == (text.rindex("Company Overview"), "Company Overview")
+
+
+def test_nesting_and_page_spans():
+    pages = ["1. Business\n" + BODY * 2, "1.1 Products\n" + BODY * 2, "2. Market\n" + BODY * 2]
+    document = PagedDocument(pages)
+    sections = build_section_tree(document.text, document)
+    titles = [section['title'] for section in sections]
+    assert titles == ["1. Business", "1.1 Products", "2. Market"]
+
+    business, products, market = sections
+    assert products['parent'] == business['index'] and business['children'] == [products['index']]
+    assert market['parent'] is None
+    assert (business['first_page'], business['last_page']) == (1, 2)
+    assert section_texts(document.text, sections)["1.1 Products"] == section_text(document.text, products)
@@ -0,0 +1,27 @@
+import os
+import threading
+
+from utils.storage import atomic_write_bytes
+
+
+def test_concurrent_atomic_writes_to_one_path(tmp_path):
+    path = str(tmp_path / "entry.bin")
+    errors = []
+
+    def write(i):
+        try:
+            for _ in range(50):
+                atomic_write_bytes(path, bytes([i]) * 4096)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    data = open(path, "rb").read()
+    assert len(data) == 4096 and len(set(data)) == 1
+    assert os.listdir(tmp_path) == ["entry.bin"]
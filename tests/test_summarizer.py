@@ -0,0 +1,56 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("openai")
+
+from utils import summarizer
+from utils.document import PagedDocument
+from utils.llm_cache import LLMResponseCache
+from utils.summarizer import split_for_summary, summarize_pieces
+
+
+class FakeClient:
+    api_key = "test"
+
+    def __init__(self):
+        self.prompts = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, **kwargs):
+        prompt = messages[-1]['content']
+        self.prompts.append(prompt)
+        message = SimpleNamespace(content=f"summary {len(self.prompts)}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def test_pages_are_grouped_within_the_token_budget():
+    document = PagedDocument(["a" * 400, "", "b" * 400, "c" * 400, "d" * 400])
+    pieces = split_for_summary(document, max_tokens=250)
+    assert [label for label, _ in pieces] == ["Pages 1-3", "Pages 4-5"]
+    assert pieces[0][1] == "a" * 400 + "\n\n" + "b" * 400
+
+
+def test_long_page_is_cut_into_windows():
+    document = PagedDocument(["x" * 1000], first_page=7)
+    pieces = split_for_summary(document, max_tokens=100)
+    assert {label for label, _ in pieces} == {"Page 7"}
+    assert "".join(text for _, text in pieces) == "x" * 1000
+
+
+def test_new_focus_reuses_the_map_phase(tmp_path, monkeypatch):
+    cache = LLMResponseCache(path=str(tmp_path / "responses.sqlite"))
+    monkeypatch.setattr(summarizer, "get_llm_cache", lambda: cache)
+    pieces = [(f"Page {i}", f"text {i}") for i in range(1, 4)]
+    client = FakeClient()
+
+    asyncio.run(summarize_pieces(pieces, client, focus="debt"))
+    assert len(client.prompts) == 4
+    assert not any("debt" in prompt for prompt in client.prompts[:3])
+
+    stats = {}
+    asyncio.run(summarize_pieces(pieces, client, focus="customers", stats=stats))
+    assert stats == {'cached': 3, 'requests': 1, 'levels': 2}
+    assert "customers" in client.prompts[-1]
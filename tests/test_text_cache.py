@@ -0,0 +1,35 @@
+import os
+import time
+
+from utils.text_cache import TextCache
+
+
+def test_round_trip_and_derived_values(tmp_path):
+    cache = TextCache(directory=str(tmp_path))
+    assert cache.get_pages("doc") is None and not cache.has_pages("doc")
+    cache.put_derived("doc", "sections", [1])  # ignored until the pages are cached
+    cache.put_pages("doc", ["one", "two"])
+    assert cache.get_pages("doc") == ["one", "two"]
+
+    calls = []
+    compute = lambda: calls.append(1) or {"a": 1}
+    assert cache.cached("doc", "sections", compute) == {"a": 1}
+    assert cache.cached("doc", "sections", compute) == {"a": 1}
+    assert len(calls) == 1
+    cache.put_pages("doc", ["one", "two", "three"])
+    assert cache.get_derived("doc", "sections") == {"a": 1}
+
+
+def test_evicts_least_recently_used_entries_by_size(tmp_path):
+    cache = TextCache(directory=str(tmp_path), max_bytes=10 ** 9)
+    for i, name in enumerate(["old", "used", "new"]):
+        cache.put_pages(name, [os.urandom(2000).hex()])
+        stamp = time.time() - 100 + i
+        os.utime(cache._path(name), (stamp, stamp))
+    cache.get_pages("used")  # touched, so now the most recently used
+
+    sizes = [os.path.getsize(cache._path(name)) for name in ["old", "used", "new"]]
+    cache.max_bytes = sum(sizes) - 1
+    cache.evict()
+    assert not cache.has_pages("old")
+    assert cache.has_pages("used") and cache.has_pages("new")
@@ -0,0 +1,50 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+faiss = pytest.importorskip("faiss")
+
+from utils.vector_index import (
+    _nlist, build_index, choose_index_kind, index_config, index_kind, index_quantization,
+    recall_at_k, search_index,
+)
+
+
+def vectors(n, dim=16, seed=0):
+    return np.random.default_rng(seed).random((n, dim), dtype=np.float32)
+
+
+def test_kind_is_chosen_by_vector_count():
+    config = index_config(flat_max=100, hnsw_max=1000, ivf_flat_max=5000)
+    assert [choose_index_kind(n, config) for n in (100, 101, 1001, 5001)] == ['flat', 'hnsw', 'ivf_flat', 'ivf_pq']
+    assert choose_index_kind(10, index_config(kind='hnsw')) == 'hnsw'
+
+
+def test_nlist_keeps_enough_training_points_per_cluster():
+    config = index_config()
+    nlist = _nlist(2_000_000, config)
+    assert config['train_size'] // nlist >= 39
+    assert _nlist(1000, config) == 1000 // 39
+
+
+@pytest.mark.parametrize("kind", ['flat', 'hnsw', 'ivf_flat'])
+def test_unquantized_indexes_have_high_recall(kind):
+    data = vectors(2000)
+    index = build_index(data, index_config(nprobe=64), kind=kind)
+    assert index_kind(index) == kind and index_quantization(index) is None
+    assert recall_at_k(index, data, k=5, num_queries=50, config=index_config(nprobe=64)) >= 0.9
+
+
+def test_tiny_corpora_fall_back_to_flat():
+    assert index_kind(build_index(vectors(50), kind='ivf_flat')) == 'flat'
+
+
+def test_quantized_search_is_reranked_with_exact_vectors():
+    data = vectors(1000)
+    config = index_config(quantization='sq8')
+    index = build_index(data, config)
+    assert index_quantization(index) == 'sq8'
+    distances, ids = search_index(index, data[:3], 4, config, exact_vectors=data)
+    assert list(ids[:, 0]) == [0, 1, 2]
+    assert np.allclose(distances[:, 0], 0)
+    assert recall_at_k(index, data, k=5, num_queries=50, config=config) >= recall_at_k(
+        index, data, k=5, num_queries=50, config=config, rerank=False)
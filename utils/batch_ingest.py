@@ -0,0 +1,199 @@
+"""Headless batch ingestion of folders of CIMs
+
+    python -m utils.batch_ingest DATA_ROOM [DATA_ROOM ...] [--deal NAME] [--workers N]
+                                 [--recursive] [--full] [--no-embed] [--force]
+
+Each PDF is processed in a worker process the same way the app processes an
+upload: page text and the section tree go to the text cache, and chunk
+embeddings, the document's FAISS index and its corpus entry go to the
+index store. Everything is keyed by the file's content hash, so the same
+store serves the app instantly afterwards, re-running over a folder only
+processes new files, and an interrupted run resumes where it stopped.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from utils.chunking import chunk_text, map_chunks_to_pages
+from utils.document import PagedDocument
+from utils.embeddings import EMBED_MODEL_NAME, embed_texts
+from utils.pdf_extraction import read_pdf_bytes
+from utils.sections import SECTION_TREE_KEY, build_section_tree
+from utils.storage import document_hash
+from utils.text_cache import extract_pages_cached, get_text_cache
+
+try:
+    from sentence_transformers import SentenceTransformer
+    from utils.corpus_index import get_corpus_index
+    from utils.index_store import FAISS_AVAILABLE, get_index_store
+    from utils.vector_index import build_index
+    EMBEDDING_AVAILABLE = FAISS_AVAILABLE
+except ImportError:
+    EMBEDDING_AVAILABLE = False
+
+# Each worker loads its own embedding model, so keep the default pool modest
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+# Embedding model of this worker process, loaded once by load_worker_model
+_model = None
+
+
+def find_pdfs(paths, recursive=False):
+    """Sorted PDF paths under the given files and directories"""
+    found = []
+    for path in paths:
+        if os.path.isfile(path):
+            found.append(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            found.extend(os.path.join(root, name) for name in files if name.lower().endswith(".pdf"))
+            if not recursive:
+                break
+    return sorted(set(found))
+
+
+def load_worker_model(workers=1):
+    """Load this process's embedding model (once), giving it its share of the cores"""
+    global _model
+    if _model is not None:
+        return _model
+    try:
+        import torch
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+    except ImportError:
+        pass
+    _model = SentenceTransformer(EMBED_MODEL_NAME)
+    return _model
+
+
+def _init_worker(embed, workers):
+    """Pool initializer: load the embedding model before the first file arrives"""
+    if embed:
+        load_worker_model(workers)
+
+
+def is_ingested(doc_hash, variant, embed=True):
+    """Whether every output for this document is already in the store"""
+    cache = get_text_cache()
+    if cache.get_pages(doc_hash) is None or cache.get_derived(doc_hash, SECTION_TREE_KEY) is None:
+        return False
+    if not embed:
+        return True
+    return (get_index_store().exists(doc_hash, EMBED_MODEL_NAME, variant)
+            and get_corpus_index(EMBED_MODEL_NAME).has_document(doc_hash))
+
+
+def ingest_file(path, fast_mode=True, deal=None, embed=True, force=False):
+    """Worker: extract, section, chunk, embed and store one PDF, returning a result dict"""
+    started = time.perf_counter()
+    pdf_bytes = read_pdf_bytes(path)
+    doc_hash = document_hash(pdf_bytes)
+    variant = 'fast' if fast_mode else 'full'
+    result = {'path': path, 'doc_hash': doc_hash, 'status': 'skipped'}
+    if not force and is_ingested(doc_hash, variant, embed):
+        return result
+
+    # This process is already one of the pool's workers, so extract serially
+    _, pages = extract_pages_cached(pdf_bytes, max_workers=1)
+    document = PagedDocument(pages)
+    text = document.text
+    sections = get_text_cache().cached(doc_hash, SECTION_TREE_KEY, lambda: build_section_tree(text, document))
+    result.update(status='ok', pages=document.num_pages, sections=len(sections), chunks=0)
+
+    if embed:
+        chunks, chunk_spans = chunk_text(text, fast_mode=fast_mode)
+        chunk_pages = map_chunks_to_pages(chunk_spans, document)
+        if chunks:
+            embeddings = embed_texts(load_worker_model(), chunks)
+            get_index_store().save(doc_hash, EMBED_MODEL_NAME, build_index(embeddings), embeddings,
+                                   chunks, chunk_pages, chunk_spans, variant)
+            get_corpus_index(EMBED_MODEL_NAME).add_document(
+                doc_hash, os.path.basename(path), embeddings, chunk_pages, chunk_spans,
+                deal=deal or None, index_variant=variant
+            )
+        result['chunks'] = len(chunks)
+
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def ingest_paths(paths, workers=DEFAULT_WORKERS, fast_mode=True, deal=None, embed=True, force=False,
+                 on_result=None):
+    """Ingest PDFs in parallel, one per worker process; returns the result dicts
+
+    Files with identical content are processed once. on_result(result) is
+    called in this process as each file finishes.
+    """
+    by_hash = {}
+    results = []
+    for path in paths:
+        doc_hash = document_hash(read_pdf_bytes(path))
+        if doc_hash in by_hash:
+            results.append({'path': path, 'doc_hash': doc_hash, 'status': 'duplicate', 'of': by_hash[doc_hash]})
+            if on_result:
+                on_result(results[-1])
+            continue
+        by_hash[doc_hash] = path
+
+    unique = list(by_hash.values())
+    workers = max(1, min(workers, len(unique) or 1))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(embed, workers)) as pool:
+        futures = {pool.submit(ingest_file, path, fast_mode, deal, embed, force): path for path in unique}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'path': futures[future], 'status': 'error', 'error': str(e)}
+            results.append(result)
+            if on_result:
+                on_result(result)
+    return results
+
+
+def _print_result(result):
+    name = os.path.basename(result['path'])
+    if result['status'] == 'ok':
+        print(f"[ok]        {name}: {result['pages']} pages, {result['sections']} sections, "
+              f"{result['chunks']} chunks in {result['seconds']:.1f}s", flush=True)
+    elif result['status'] == 'skipped':
+        print(f"[skipped]   {name}: already ingested", flush=True)
+    elif result['status'] == 'duplicate':
+        print(f"[duplicate] {name}: same content as {os.path.basename(result['of'])}", flush=True)
+    else:
+        print(f"[error]     {name}: {result['error']}", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-process folders of CIM PDFs into the shared Auctum store")
+    parser.add_argument("paths", nargs="+", help="PDF files or directories of PDFs")
+    parser.add_argument("--recursive", "-r", action="store_true", help="descend into subdirectories")
+    parser.add_argument("--workers", "-j", type=int, default=DEFAULT_WORKERS, help="worker processes")
+    parser.add_argument("--deal", help="deal name recorded with every document in the corpus")
+    parser.add_argument("--full", action="store_true", help="sentence chunking instead of fast paragraph chunking")
+    parser.add_argument("--no-embed", action="store_true", help="only extract text and sections")
+    parser.add_argument("--force", action="store_true", help="re-process files that are already ingested")
+    args = parser.parse_args(argv)
+
+    embed = not args.no_embed
+    if embed and not EMBEDDING_AVAILABLE:
+        parser.error("embedding needs sentence-transformers and faiss-cpu; install them or pass --no-embed")
+
+    paths = find_pdfs(args.paths, args.recursive)
+    if not paths:
+        parser.error("no PDF files found")
+
+    started = time.perf_counter()
+    results = ingest_paths(paths, args.workers, fast_mode=not args.full, deal=args.deal, embed=embed,
+                           force=args.force, on_result=_print_result)
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+    print(f"{len(results)} files in {time.perf_counter() - started:.1f}s: {summary}")
+    return 1 if counts.get('error') else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
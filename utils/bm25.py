@@ -0,0 +1,113 @@
+"""BM25 inverted index over document chunks"""
+import heapq
+import math
+import re
+import threading
+from array import array
+from collections import Counter
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_token(token):
+    """Light stemming so 'revenues' matches 'revenue' the way substring counting did"""
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Lowercase word tokens, lightly stemmed"""
+    return [normalize_token(token) for token in TOKEN_RE.findall(text.lower())]
+
+
+class BM25Index:
+    """Inverted index with BM25 scoring over postings
+
+    Built once at ingest (documents can be appended batch by batch while it
+    is being queried); a query only touches the postings of its own terms.
+    Document ids are assigned in insertion order, starting at 0.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.doc_lengths = array('i')
+        self.total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add_documents(self, texts):
+        """Tokenize and index texts, returning the id of the first one"""
+        tokenized = [Counter(tokenize(text)) for text in texts]
+        with self._lock:
+            first_id = len(self.doc_lengths)
+            for offset, counts in enumerate(tokenized):
+                doc_id = first_id + offset
+                length = sum(counts.values())
+                self.doc_lengths.append(length)
+                self.total_length += length
+                for term, tf in counts.items():
+                    posting = self.postings.get(term)
+                    if posting is None:
+                        posting = self.postings[term] = (array('i'), array('i'))
+                    posting[0].append(doc_id)
+                    posting[1].append(tf)
+            return first_id
+
+    def state(self):
+        """JSON-serialisable contents, e.g. to keep in the text cache"""
+        with self._lock:
+            return {
+                'k1': self.k1, 'b': self.b,
+                'doc_lengths': self.doc_lengths.tolist(),
+                'postings': {term: [ids.tolist(), tfs.tolist()] for term, (ids, tfs) in self.postings.items()},
+            }
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild an index saved with state() without re-tokenizing anything"""
+        index = cls(state['k1'], state['b'])
+        index.doc_lengths = array('i', state['doc_lengths'])
+        index.total_length = sum(index.doc_lengths)
+        index.postings = {term: (array('i', ids), array('i', tfs)) for term, (ids, tfs) in state['postings'].items()}
+        return index
+
+    def idf(self, term):
+        """BM25 inverse document frequency (never negative)"""
+        posting = self.postings.get(term)
+        df = len(posting[0]) if posting else 0
+        n = len(self.doc_lengths)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def score(self, query_terms, weights=None):
+        """BM25 scores {doc_id: score} for documents containing any query term
+
+        query_terms are raw words (they are normalised here); weights
+        optionally maps a normalised term to a multiplier.
+        """
+        scores = {}
+        with self._lock:
+            n = len(self.doc_lengths)
+            if not n:
+                return scores
+            avg_length = self.total_length / n
+            terms = {normalize_token(term.lower()) for term in query_terms}
+            for term in terms:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = self.idf(term) * (weights.get(term, 1.0) if weights else 1.0)
+                k1, b = self.k1, self.b
+                for doc_id, tf in zip(*posting):
+                    norm = k1 * (1 - b + b * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+        return scores
+
+    def top_k(self, query, k=5):
+        """The k best (score, doc_id) pairs for a free-text query"""
+        scores = self.score(tokenize(query))
+        return heapq.nlargest(k, ((score, doc_id) for doc_id, score in scores.items()))
@@ -0,0 +1,99 @@
+"""Paragraph/sentence chunking of document text"""
+import re
+
+# Longest chunk the embedding model reads in full: its 256-token window at ~4 characters per token
+MAX_CHUNK_CHARS = 1000
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def split_span(text, start, end, max_chars=MAX_CHUNK_CHARS, overlap=100):
+    """(start, end) windows of at most max_chars covering text[start:end]
+
+    Windows end at whitespace where possible and overlap the previous one
+    by about overlap characters, so no text falls outside every window.
+    """
+    windows = []
+    while end - start > max_chars:
+        cut = start + max_chars
+        space = max(text.rfind(" ", start + max_chars // 2, cut), text.rfind("\n", start + max_chars // 2, cut))
+        if space > start:
+            cut = space
+        windows.append((start, cut))
+        # Restart a little before the cut, at a word boundary
+        start = cut - min(overlap, max_chars // 4)
+        gap = WHITESPACE_RE.search(text, start, cut)
+        if gap:
+            start = gap.end()
+    windows.append((start, end))
+    return windows
+
+
+def chunk_text(text, chunk_size=500, overlap=100, fast_mode=True, offset=0, max_chars=MAX_CHUNK_CHARS):
+    """Split text into smaller, faster-to-process chunks
+
+    Returns the chunks and their (start, end) character spans in the
+    document; offset is the position of text within the whole document.
+    Chunks longer than max_chars (e.g. a whole page PyPDF2 extracted
+    without blank lines) are split into overlapping windows, so the
+    embedding model never truncates part of the text away.
+    """
+    chunks = []
+    spans = []
+
+    if fast_mode:
+        # Super fast chunking - just split by paragraphs
+        paragraphs = text.split('\n\n')
+        pos = 0
+        for p in paragraphs:
+            stripped = p.strip()
+            if stripped:
+                start = pos + len(p) - len(p.lstrip())
+                for window_start, window_end in split_span(text, start, start + len(stripped), max_chars, overlap):
+                    chunks.append(text[window_start:window_end])
+                    spans.append((offset + window_start, offset + window_end))
+            pos += len(p) + 2
+    else:
+        # More thorough chunking
+        sentences = text.split('. ')
+        current_chunk = ""
+        chunk_start = chunk_end = offset
+        pos = offset
+
+        for sentence in sentences:
+            sentence_start, sentence_end = pos, min(pos + len(sentence) + 1, offset + len(text))
+            pos += len(sentence) + 2
+            if len(current_chunk) + len(sentence) < chunk_size:
+                if not current_chunk:
+                    chunk_start = sentence_start
+                current_chunk += sentence + ". "
+            else:
+                if current_chunk.strip():
+                    chunks.append(current_chunk.strip())
+                    spans.append((chunk_start, chunk_end))
+                current_chunk = sentence + ". "
+                chunk_start = sentence_start
+            chunk_end = sentence_end
+
+        if current_chunk.strip():
+            chunks.append(current_chunk.strip())
+            spans.append((chunk_start, chunk_end))
+
+        # A single sentence can exceed the model window too (e.g. a table without periods)
+        capped_chunks, capped_spans = [], []
+        for chunk, (start, end) in zip(chunks, spans):
+            if len(chunk) <= max_chars:
+                capped_chunks.append(chunk)
+                capped_spans.append((start, end))
+                continue
+            for window_start, window_end in split_span(text, start - offset, end - offset, max_chars, overlap):
+                capped_chunks.append(text[window_start:window_end])
+                capped_spans.append((offset + window_start, offset + window_end))
+        chunks, spans = capped_chunks, capped_spans
+
+    return chunks, spans
+
+
+def map_chunks_to_pages(chunk_spans, document):
+    """Exact page on which each chunk starts, from the document's page-boundary index"""
+    return [document.page_at(start) for start, _ in chunk_spans]
@@ -0,0 +1,124 @@
+"""Token-budget context assembly for LLM prompts
+
+Retrieved passages are character spans of the document with a relevance
+score. Overlapping and adjacent spans are merged (so chunk overlap is sent
+once), then whole passages are packed greedily by score until the token
+budget is spent, and emitted in document order with page citations.
+"""
+import os
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+# Prompt tokens given to retrieved context unless a caller asks otherwise
+DEFAULT_CONTEXT_TOKENS = int(os.environ.get("AUCTUM_CONTEXT_TOKENS", 3000))
+
+# Rough characters per token when no tokenizer is installed
+CHARS_PER_TOKEN = 4
+
+# Spans this close together are merged into one passage
+MERGE_GAP_CHARS = 2
+
+# A passage is only cut to fit when at least this many tokens are left
+MIN_PARTIAL_TOKENS = 64
+
+PASSAGE_SEPARATOR = "\n\n---\n\n"
+
+_encodings = {}
+
+
+def get_encoding(model=None):
+    """tiktoken encoding for a model (cl100k_base if unknown)
+
+    None only when tiktoken (a requirement) is missing or its encoding files
+    can't be loaded (e.g. first use on an offline host); callers then fall
+    back to the CHARS_PER_TOKEN estimate.
+    """
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    if model not in _encodings:
+        try:
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+            except (KeyError, ValueError):
+                _encodings[model] = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encodings[model] = None
+    return _encodings[model]
+
+
+def count_tokens(text, model=None):
+    """Tokens in text for the model's tokenizer (a length estimate only as a fallback)"""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text, max_tokens, model=None):
+    """The longest prefix of text that fits in max_tokens"""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return text[:max(0, max_tokens - 1) * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+def merge_passages(passages, gap=MERGE_GAP_CHARS):
+    """Merge (start, end, score) spans that overlap or nearly touch
+
+    A merged passage keeps the best score of its parts. Returned in
+    document order.
+    """
+    merged = []
+    for start, end, score in sorted(passages):
+        if merged and start <= merged[-1][1] + gap:
+            last_start, last_end, last_score = merged[-1]
+            merged[-1] = (last_start, max(last_end, end), max(last_score, score))
+        else:
+            merged.append((start, end, score))
+    return merged
+
+
+def passage_label(document, start, end):
+    """Citation header for a passage: its page or page range"""
+    if document is None:
+        return "[Excerpt]"
+    first, last = document.page_span(start, end)
+    return f"[Page {first}]" if first == last else f"[Pages {first}-{last}]"
+
+
+def pack_context(passages, text, max_tokens=DEFAULT_CONTEXT_TOKENS, document=None, model=None, stats=None):
+    """Context string of the best passages that fit in max_tokens
+
+    passages are (start, end, score) character spans of text. After merging,
+    passages are taken greedily by score; one that does not fit is skipped,
+    or cut to fit if it would be the first or enough budget remains. stats,
+    if given, receives the passages considered, packed and the tokens used.
+    """
+    merged = merge_passages(passages)
+    separator_tokens = count_tokens(PASSAGE_SEPARATOR, model)
+    remaining = max_tokens
+    packed = []
+    for start, end, score in sorted(merged, key=lambda passage: -passage[2]):
+        body = document.slice(start, end) if document is not None else text[start:end]
+        part = f"{passage_label(document, start, end)}\n{body.strip()}"
+        cost = count_tokens(part, model) + (separator_tokens if packed else 0)
+        if cost > remaining:
+            if packed and remaining < MIN_PARTIAL_TOKENS:
+                continue
+            part = truncate_to_tokens(part, remaining - (separator_tokens if packed else 0), model)
+            if not part:
+                continue
+            cost = remaining
+        packed.append((start, part))
+        remaining -= cost
+        if remaining <= 0:
+            break
+
+    if stats is not None:
+        stats.update(passages=len(passages), merged=len(merged), packed=len(packed), tokens=max_tokens - remaining)
+    return PASSAGE_SEPARATOR.join(part for _, part in sorted(packed))
@@ -0,0 +1,320 @@
+"""Cross-document vector index over every processed document"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import date
+
+import numpy as np
+
+from utils.storage import atomic_write_bytes, get_store_path, remove_quietly, temp_path_for
+from utils.vector_index import (
+    build_index, built_layout, configure_search, index_config, index_kind,
+    index_memory_bytes, index_quantization, recall_at_k, search_index,
+)
+
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# One row per chunk in the corpus; a vector's FAISS id is its row number
+CHUNK_DTYPE = np.dtype([('doc', np.int32), ('page', np.int32), ('start', np.int64), ('end', np.int64)])
+
+
+class CorpusIndex:
+    """Vector index over the chunks of every processed document
+
+    Per-chunk metadata lives in a compact side table (chunks.bin, CHUNK_DTYPE
+    records) rather than alongside the vectors. Documents are listed in
+    corpus.json with their hash, name, deal and date, and each owns a
+    contiguous run of rows, so document/deal/date filters become id ranges
+    passed to FAISS as a search-time selector.
+
+    The exact float32 vectors are kept in an append-only file
+    (vectors.f32), from which the ANN index is rebuilt whenever the corpus
+    outgrows its current index kind or training sample. They are also what
+    results are re-ranked against when the resident index is quantized.
+
+    Adding a document appends its rows to both files and its vectors to the
+    resident index, so it costs O(document), not O(corpus). The index file
+    (vectors.faiss) is only rewritten after a rebuild or once the corpus
+    has grown PERSIST_GROWTH past the rows it holds; other processes add
+    the newer rows to their loaded index from vectors.f32 instead of
+    re-reading it.
+    """
+
+    # Retrain a clustered index once the corpus has grown this much past its training set
+    RETRAIN_GROWTH = 4
+
+    # Rewrite vectors.faiss once rows not in it exceed this share of it (or PERSIST_MIN_ROWS)
+    PERSIST_GROWTH = 0.25
+    PERSIST_MIN_ROWS = 50_000
+
+    def __init__(self, model_name, directory=None, config=None):
+        self.model_name = model_name
+        self.directory = directory or get_store_path("corpus", model_name.replace("/", "_"))
+        self.config = index_config(config)
+        self.index = None
+        self.table = np.empty(0, dtype=CHUNK_DTYPE)
+        self.documents = []
+        self.dim = None
+        self.trained_on = 0
+        self._doc_hashes = set()
+        # Rows in vectors.faiss, its write count, and rows in the resident index
+        self._persisted_rows = 0
+        self._index_version = 0
+        self._index_rows = 0
+        self._version = None
+        self._lock = threading.RLock()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _file_lock(self):
+        """Serialise writers across processes (the app and batch ingest share the store)"""
+        with open(self._path("lock"), "w") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _map_table(self, rows):
+        """The first rows of the side table, memory-mapped read-only"""
+        if not rows:
+            return np.empty(0, dtype=CHUNK_DTYPE)
+        return np.memmap(self._path("chunks.bin"), dtype=CHUNK_DTYPE, mode="r", shape=(rows,))
+
+    def refresh(self):
+        """Catch up with documents added by another session or process
+
+        Only the new rows are read; the index file is re-read only if it
+        has been rewritten (after a rebuild, or once enough rows piled up).
+        """
+        state_path = self._path("corpus.json")
+        try:
+            version = os.stat(state_path).st_mtime_ns
+        except OSError:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            with open(state_path, encoding="utf-8") as f:
+                state = json.load(f)
+            self.documents = state['documents']
+            self._doc_hashes = {doc['doc_hash'] for doc in self.documents}
+            self.dim = state['dim']
+            self.trained_on = state['trained_on']
+            total = sum(doc['num_chunks'] for doc in self.documents)
+            self.table = self._map_table(total)
+
+            index_version = state['index_version']
+            if self.index is None or index_version != self._index_version or self._index_rows > total:
+                self.index = configure_search(faiss.read_index(self._path("vectors.faiss")), self.config)
+                self._index_version = index_version
+                self._persisted_rows = self._index_rows = state['persisted_rows']
+            if self._index_rows < total:
+                self.index.add(np.ascontiguousarray(self.vectors()[self._index_rows:total]))
+                self._index_rows = total
+            self._version = version
+
+    def vectors(self):
+        """The exact stored vectors, memory-mapped read-only"""
+        rows = len(self.table)
+        if not rows:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r", shape=(rows, self.dim))
+
+    def _append(self, name, data, committed_bytes):
+        with open(self._path(name), "ab") as f:
+            # Drop bytes left behind by a writer that died before committing
+            f.truncate(committed_bytes)
+            f.write(data.tobytes())
+
+    def _persist_index(self):
+        index_path = self._path("vectors.faiss")
+        tmp_path = temp_path_for(index_path)
+        try:
+            faiss.write_index(self.index, tmp_path)
+            os.replace(tmp_path, index_path)
+        finally:
+            remove_quietly(tmp_path)
+        self._persisted_rows = self._index_rows
+        self._index_version += 1
+
+    def _save_state(self):
+        # Written last: it commits the appended rows, and its mtime is the version readers check
+        state = {
+            'dim': self.dim, 'trained_on': self.trained_on, 'documents': self.documents,
+            'index_version': self._index_version, 'persisted_rows': self._persisted_rows,
+        }
+        atomic_write_bytes(self._path("corpus.json"), json.dumps(state).encode("utf-8"))
+        self._version = os.stat(self._path("corpus.json")).st_mtime_ns
+
+    def _needs_rebuild(self, total):
+        if self.index is None:
+            return True
+        kind = index_kind(self.index)
+        if (kind, index_quantization(self.index)) != built_layout(total, self.config):
+            return True
+        return kind.startswith('ivf') and total >= self.RETRAIN_GROWTH * self.trained_on
+
+    def has_document(self, doc_hash):
+        self.refresh()
+        return doc_hash in self._doc_hashes
+
+    def add_document(self, doc_hash, name, embeddings, chunk_pages, chunk_spans=None,
+                     deal=None, doc_date=None, **metadata):
+        """Add a document's chunk vectors; a document already in the corpus is skipped"""
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        with self._lock, self._file_lock():
+            self.refresh()
+            if doc_hash in self._doc_hashes:
+                return False
+            if self.dim is None:
+                self.dim = embeddings.shape[1]
+
+            rows = np.empty(len(embeddings), dtype=CHUNK_DTYPE)
+            rows['doc'] = len(self.documents)
+            rows['page'] = chunk_pages
+            if chunk_spans:
+                spans = np.asarray(chunk_spans, dtype=np.int64)
+                rows['start'], rows['end'] = spans[:, 0], spans[:, 1]
+            else:
+                rows['start'] = rows['end'] = -1
+
+            first_row = len(self.table)
+            total = first_row + len(rows)
+            self._append("vectors.f32", embeddings, first_row * self.dim * 4)
+            self._append("chunks.bin", rows, first_row * CHUNK_DTYPE.itemsize)
+            self.documents.append({
+                'doc_hash': doc_hash,
+                'name': name,
+                'deal': deal,
+                'date': (doc_date or date.today()).isoformat(),
+                'first_row': first_row,
+                'num_chunks': len(rows),
+                **metadata,
+            })
+            self._doc_hashes.add(doc_hash)
+            self.table = self._map_table(total)
+
+            if self._needs_rebuild(total):
+                self.index = build_index(self.vectors(), self.config)
+                self.trained_on = total
+                self._index_rows = total
+                self._persist_index()
+            else:
+                self.index.add(embeddings)
+                self._index_rows = total
+                if total - self._persisted_rows >= max(self.PERSIST_MIN_ROWS,
+                                                       self.PERSIST_GROWTH * self._persisted_rows):
+                    self._persist_index()
+            self._save_state()
+            return True
+
+    def select_documents(self, doc_hashes=None, deals=None, date_from=None, date_to=None):
+        """Documents matching every given filter (dates are datetime.date, inclusive)"""
+        selected = []
+        for doc in self.documents:
+            if doc_hashes and doc['doc_hash'] not in doc_hashes:
+                continue
+            if deals and doc.get('deal') not in deals:
+                continue
+            doc_date = date.fromisoformat(doc['date'])
+            if date_from and doc_date < date_from:
+                continue
+            if date_to and doc_date > date_to:
+                continue
+            selected.append(doc)
+        return selected
+
+    def _selector(self, selected):
+        """FAISS ID selector restricting results to the rows of the selected documents"""
+        if len(selected) == len(self.documents):
+            return None, None
+        ranges = [(doc['first_row'], doc['first_row'] + doc['num_chunks']) for doc in selected]
+        if len(ranges) == 1:
+            return faiss.IDSelectorRange(*ranges[0]), None
+        ids = np.concatenate([np.arange(start, end, dtype=np.int64) for start, end in ranges])
+        # ids must outlive the search, since the selector only points at them
+        return faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids)), ids
+
+    def search(self, query_embeddings, top_k=10, doc_hashes=None, deals=None, date_from=None, date_to=None):
+        """Top-k chunks across the corpus for one query vector, optionally filtered"""
+        self.refresh()
+        with self._lock:
+            if self.index is None or self.index.ntotal == 0:
+                return []
+            selected = self.select_documents(doc_hashes, deals, date_from, date_to)
+            if not selected:
+                return []
+
+            selector, ids = self._selector(selected)
+            query = np.ascontiguousarray(query_embeddings, dtype=np.float32).reshape(1, -1)
+            k = min(top_k, sum(doc['num_chunks'] for doc in selected))
+            distances, rows = search_index(self.index, query, k, self.config, selector, exact_vectors=self.vectors())
+
+            results = []
+            for distance, row in zip(distances[0], rows[0]):
+                if row < 0:
+                    continue
+                meta = self.table[row]
+                doc = self.documents[meta['doc']]
+                results.append({
+                    'doc_hash': doc['doc_hash'],
+                    'name': doc['name'],
+                    'deal': doc.get('deal'),
+                    'date': doc['date'],
+                    'chunk': int(row - doc['first_row']),
+                    'page': int(meta['page']),
+                    'start': int(meta['start']),
+                    'end': int(meta['end']),
+                    'distance': float(distance),
+                    'document': doc,
+                })
+            return results
+
+    def stats(self):
+        """Index kind, size and approximate memory use"""
+        self.refresh()
+        if self.index is None:
+            return {'kind': None, 'quantization': None, 'vectors': 0, 'memory_bytes': 0}
+        return {
+            'kind': index_kind(self.index),
+            'quantization': index_quantization(self.index),
+            'vectors': int(self.index.ntotal),
+            'memory_bytes': index_memory_bytes(self.index),
+        }
+
+    def recall_at_k(self, k=10, num_queries=200):
+        """Recall of the current index against exact search over the stored vectors"""
+        self.refresh()
+        if self.index is None:
+            return 1.0
+        return recall_at_k(self.index, self.vectors(), k=k, num_queries=num_queries, config=self.config)
+
+
+_corpus_indexes = {}
+_corpus_lock = threading.Lock()
+
+
+def get_corpus_index(model_name, config=None):
+    """Return the process-wide corpus index for an embedding model
+
+    config (see DEFAULT_INDEX_CONFIG) applies when the index is first opened.
+    """
+    with _corpus_lock:
+        if model_name not in _corpus_indexes:
+            _corpus_indexes[model_name] = CorpusIndex(model_name, config=config)
+        return _corpus_indexes[model_name]
@@ -0,0 +1,94 @@
+"""Page-offset document model"""
+import threading
+from bisect import bisect_right
+
+PAGE_SEPARATOR = "\n\n"
+
+
+class PagedDocument:
+    """Document text held as page strings plus cumulative character offsets
+
+    The full text is the non-empty pages joined with PAGE_SEPARATOR after each
+    one; it is built once on first access instead of by repeated
+    concatenation, and is safe to read while another thread extends the
+    document. page_starts[i] is the character offset at which page i
+    begins, so offset -> page lookups are a binary search. A document can
+    also describe a window of a larger one (first_page/base_offset), which is
+    how ingest batches are chunked against whole-document positions.
+    """
+
+    def __init__(self, pages=(), separator=PAGE_SEPARATOR, first_page=1, base_offset=0):
+        self.separator = separator
+        self.first_page = first_page
+        self.base_offset = base_offset
+        self.pages = []
+        self.page_starts = []
+        self.end_offset = base_offset
+        self._text = None
+        # Orders extend() against building _text, so a join of fewer pages is never cached after an extend
+        self._lock = threading.Lock()
+        self.extend(pages)
+
+    def extend(self, pages):
+        """Append pages, returning the offset at which the first new page starts"""
+        with self._lock:
+            start = self.end_offset
+            for page_text in pages:
+                self.page_starts.append(self.end_offset)
+                self.pages.append(page_text)
+                if page_text:
+                    self.end_offset += len(page_text) + len(self.separator)
+            self._text = None
+            return start
+
+    @property
+    def text(self):
+        """The joined document text (built lazily, cached until the next extend)"""
+        text = self._text
+        if text is None:
+            with self._lock:
+                if self._text is None:
+                    self._text = "".join(page_text + self.separator for page_text in self.pages if page_text)
+                text = self._text
+        return text
+
+    @property
+    def num_pages(self):
+        return len(self.pages)
+
+    @property
+    def last_page(self):
+        return self.first_page + len(self.pages) - 1
+
+    def __len__(self):
+        return self.end_offset - self.base_offset
+
+    def page_at(self, offset):
+        """1-based page number containing a character offset, clamped to the document"""
+        if not self.pages:
+            return self.first_page
+        i = bisect_right(self.page_starts, offset) - 1
+        return self.first_page + min(max(i, 0), len(self.pages) - 1)
+
+    def page_span(self, start, end):
+        """(first_page, last_page) covered by the character range [start, end)"""
+        return self.page_at(start), self.page_at(max(start, end - 1))
+
+    def page_text(self, page_num):
+        """The stored text of a page, without copying"""
+        return self.pages[page_num - self.first_page]
+
+    def page_offsets(self, page_num):
+        """(start, end) character offsets of a page's text"""
+        i = page_num - self.first_page
+        start = self.page_starts[i]
+        return start, start + len(self.pages[i])
+
+    def slice(self, start, end):
+        """Text in [start, end), served from the page itself when it lies within one page"""
+        first, last = self.page_span(start, end)
+        if first == last:
+            page_start, page_end = self.page_offsets(first)
+            if page_start <= start and end <= page_end:
+                return self.page_text(first)[start - page_start:end - page_start]
+        return self.text[start - self.base_offset:end - self.base_offset]
@@ -0,0 +1,72 @@
+"""Full-document embedding with adaptive batching"""
+import time
+
+import numpy as np
+
+# Sentence embedding model used for semantic search; part of every persisted index key
+EMBED_MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# Rough characters per token, used to size batches without tokenizing
+CHARS_PER_TOKEN = 4
+
+# Token budget per encode() call; bounds peak activation memory on CPU hosts
+DEFAULT_BATCH_TOKENS = 8192
+
+MIN_BATCH_SIZE = 4
+MAX_BATCH_SIZE = 128
+
+
+def plan_batches(texts, max_seq_length=256, batch_tokens=DEFAULT_BATCH_TOKENS):
+    """Group text indices into batches of similar length that fit the token budget
+
+    Sorting by length keeps padding low; long texts get small batches and
+    short texts large ones, so memory per batch stays roughly constant.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    batches = []
+    current = []
+    for i in order:
+        tokens = min(max_seq_length, len(texts[i]) // CHARS_PER_TOKEN + 1)
+        # Every text in a batch is padded to its longest member, which is this one
+        if current and (
+            (len(current) + 1) * tokens > batch_tokens and len(current) >= MIN_BATCH_SIZE
+            or len(current) >= MAX_BATCH_SIZE
+        ):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def embed_texts(model, texts, batch_tokens=DEFAULT_BATCH_TOKENS, stats=None):
+    """Embed every text into one contiguous float32 array, in input order
+
+    If stats is a dict it is updated in place with running totals
+    ('chunks', 'seconds', 'batches', 'chunks_per_sec').
+    """
+    dim = model.get_sentence_embedding_dimension()
+    embeddings = np.empty((len(texts), dim), dtype=np.float32)
+    if not texts:
+        return embeddings
+
+    max_seq_length = getattr(model, "max_seq_length", 256) or 256
+    batches = plan_batches(texts, max_seq_length, batch_tokens)
+
+    started = time.perf_counter()
+    for batch in batches:
+        embeddings[batch] = model.encode(
+            [texts[i] for i in batch],
+            batch_size=len(batch),
+            show_progress_bar=False,
+            convert_to_numpy=True
+        )
+    elapsed = time.perf_counter() - started
+
+    if stats is not None:
+        stats['chunks'] = stats.get('chunks', 0) + len(texts)
+        stats['seconds'] = stats.get('seconds', 0.0) + elapsed
+        stats['batches'] = stats.get('batches', 0) + len(batches)
+        stats['chunks_per_sec'] = stats['chunks'] / stats['seconds'] if stats['seconds'] else 0.0
+    return embeddings
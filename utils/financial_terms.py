@@ -0,0 +1,110 @@
+"""Financial term extraction and a precomputed index of financial mentions"""
+import re
+import threading
+from bisect import bisect_left, bisect_right
+
+from utils.document import PAGE_SEPARATOR
+
+# Patterns for amounts and financial phrases, in priority order
+FINANCIAL_PATTERNS = [
+    r'\$[\d,]+\.?\d*\s*(?:million|billion|thousand)?',
+    r'€[\d,]+\.?\d*\s*(?:million|billion|thousand)?',
+    r'[\d,]+\.?\d*\s*(?:million|billion|thousand)?\s*(?:USD|EUR|dollars|euros)',
+    r'revenue[s]?\s*:?\s*\$?€?[\d,]+',
+    r'profit[s]?\s*:?\s*\$?€?[\d,]+',
+    r'debt[s]?\s*:?\s*\$?€?[\d,]+',
+    r'financial\s+(?:details|information|data|metrics)',
+    r'senior\s+secured\s+credit\s+facilities',
+]
+
+# All patterns as one alternation, compiled once; group kN is FINANCIAL_PATTERNS[N]
+FINANCIAL_SCANNER = re.compile(
+    "|".join(f"(?P<k{kind}>{pattern})" for kind, pattern in enumerate(FINANCIAL_PATTERNS)),
+    re.IGNORECASE
+)
+
+# Characters of surrounding text shown with a mention
+CONTEXT_CHARS = 200
+
+
+def scan_financial_terms(text, offset=0):
+    """(start, end, kind) of every financial mention in text, in one pass, kind being the pattern's index
+
+    Where patterns overlap, the leftmost match wins, and at the same position
+    the earlier pattern does. offset is added to positions so text can be a
+    slice of a larger document.
+    """
+    return [
+        (offset + match.start(), offset + match.end(), int(match.lastgroup[1:]))
+        for match in FINANCIAL_SCANNER.finditer(text)
+    ]
+
+
+def scan_pages(pages, offset=0, separator=PAGE_SEPARATOR):
+    """Yield (start, end, kind) mentions page by page, at whole-document offsets
+
+    Offsets follow the PagedDocument layout, so any page iterator (e.g. an
+    ingest in progress) can be scanned without building the full text.
+    """
+    for page_text in pages:
+        if not page_text:
+            continue
+        yield from scan_financial_terms(page_text, offset)
+        offset += len(page_text) + len(separator)
+
+
+class FinancialMentionIndex:
+    """Financial mentions of a document, extracted once at ingest
+
+    Mention start offsets are kept sorted, so the number of mentions inside
+    any character range is two binary searches. Mentions are also kept per
+    pattern so the highest-priority ones can be listed without rescanning.
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.kinds = []
+        self.by_kind = [[] for _ in FINANCIAL_PATTERNS]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add_text(self, text, offset=0):
+        """Scan a slice of the document starting at offset (slices must arrive in order)"""
+        self.extend(scan_financial_terms(text, offset))
+
+    def add_pages(self, pages, offset=0):
+        """Scan pages laid out from offset (batches must arrive in order)"""
+        self.extend(scan_pages(pages, offset))
+
+    def extend(self, mentions):
+        """Add (start, end, kind) mentions lying after everything already indexed"""
+        mentions = sorted(mentions)
+        with self._lock:
+            for start, end, kind in mentions:
+                self.by_kind[kind].append(len(self.starts))
+                self.starts.append(start)
+                self.ends.append(end)
+                self.kinds.append(kind)
+
+    def mentions(self):
+        """Every (start, end, kind) mention in document order, e.g. to cache and extend() later"""
+        with self._lock:
+            return list(zip(self.starts, self.ends, self.kinds))
+
+    def count_in_range(self, start, end):
+        """Number of mentions starting within [start, end] (inclusive)"""
+        return bisect_right(self.starts, end) - bisect_left(self.starts, start)
+
+    def top(self, limit=5):
+        """Up to limit (start, end, kind) mentions, highest-priority pattern first, then by position"""
+        found = []
+        with self._lock:
+            for positions in self.by_kind:
+                for i in positions[:limit - len(found)]:
+                    found.append((self.starts[i], self.ends[i], self.kinds[i]))
+                if len(found) >= limit:
+                    break
+        return found
@@ -0,0 +1,153 @@
+"""Persistent FAISS indexes and embedding matrices keyed by document hash and model"""
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+from utils.query_cache import LRUCache
+from utils.storage import atomic_write_bytes, get_store_path, remove_quietly, temp_path_for
+
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+
+# Stored indexes kept open per process, most recently used first
+LOADED_INDEX_CACHE_SIZE = int(os.environ.get("AUCTUM_LOADED_INDEXES", 8))
+
+
+def _model_slug(model_name):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+
+
+class IndexStore:
+    """On-disk store of per-document search indexes
+
+    Each entry lives in indexes/<model>/<doc_hash>/<variant>/ and holds the
+    FAISS index (index.faiss), the float32 embedding matrix (embeddings.npy,
+    opened memory-mapped) and the chunks with their pages (meta.json).
+    Recently loaded entries are kept per process (up to max_loaded), so
+    every session shares one copy.
+    """
+
+    def __init__(self, directory=None, max_loaded=LOADED_INDEX_CACHE_SIZE):
+        self.directory = directory or get_store_path("indexes")
+        self._loaded = LRUCache(max_loaded)
+        self._lock = threading.Lock()
+
+    def _entry_dir(self, doc_hash, model_name, variant):
+        return os.path.join(self.directory, _model_slug(model_name), doc_hash, variant)
+
+    def exists(self, doc_hash, model_name, variant="default"):
+        """Whether a complete entry has been written for this document"""
+        return os.path.exists(os.path.join(self._entry_dir(doc_hash, model_name, variant), "meta.json"))
+
+    def save(self, doc_hash, model_name, index, embeddings, chunks, chunk_pages, chunk_spans=None,
+             variant="default"):
+        """Write an index, its embeddings and chunk metadata; meta.json is written last"""
+        entry_dir = self._entry_dir(doc_hash, model_name, variant)
+        os.makedirs(entry_dir, exist_ok=True)
+
+        # Unique temp names: two sessions finishing the same document may save it at once
+        embeddings_path = os.path.join(entry_dir, "embeddings.npy")
+        tmp_path = temp_path_for(embeddings_path)
+        try:
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.ascontiguousarray(embeddings, dtype=np.float32))
+            os.replace(tmp_path, embeddings_path)
+        finally:
+            remove_quietly(tmp_path)
+
+        index_path = os.path.join(entry_dir, "index.faiss")
+        tmp_path = temp_path_for(index_path)
+        try:
+            faiss.write_index(index, tmp_path)
+            os.replace(tmp_path, index_path)
+        finally:
+            remove_quietly(tmp_path)
+
+        meta = {
+            'model': model_name,
+            'chunks': chunks,
+            'chunk_pages': chunk_pages,
+            'chunk_spans': chunk_spans,
+            'ntotal': int(index.ntotal),
+        }
+        atomic_write_bytes(os.path.join(entry_dir, "meta.json"), json.dumps(meta).encode("utf-8"))
+
+        with self._lock:
+            self._loaded.pop((doc_hash, model_name, variant), None)
+
+    def load(self, doc_hash, model_name, variant="default"):
+        """Return a StoredIndex for the entry, or None if it hasn't been built"""
+        key = (doc_hash, model_name, variant)
+        with self._lock:
+            stored = self._loaded.get(key)
+            if stored is not None:
+                return stored
+            if not self.exists(*key):
+                return None
+            stored = StoredIndex(self._entry_dir(*key))
+            self._loaded.put(key, stored)
+            return stored
+
+
+class StoredIndex:
+    """A persisted document index whose parts are read from disk on first use"""
+
+    def __init__(self, entry_dir):
+        self.entry_dir = entry_dir
+        self._meta = None
+        self._index = None
+        self._embeddings = None
+        self._lock = threading.Lock()
+
+    @property
+    def meta(self):
+        if self._meta is None:
+            with open(os.path.join(self.entry_dir, "meta.json"), encoding="utf-8") as f:
+                self._meta = json.load(f)
+        return self._meta
+
+    @property
+    def chunks(self):
+        return self.meta['chunks']
+
+    @property
+    def chunk_pages(self):
+        return self.meta['chunk_pages']
+
+    @property
+    def chunk_spans(self):
+        return self.meta.get('chunk_spans')
+
+    @property
+    def index(self):
+        """The FAISS index, read on first access"""
+        with self._lock:
+            if self._index is None:
+                self._index = faiss.read_index(os.path.join(self.entry_dir, "index.faiss"))
+            return self._index
+
+    @property
+    def embeddings(self):
+        """The embedding matrix, memory-mapped read-only"""
+        with self._lock:
+            if self._embeddings is None:
+                self._embeddings = np.load(os.path.join(self.entry_dir, "embeddings.npy"), mmap_mode="r")
+            return self._embeddings
+
+
+_index_store = None
+
+
+def get_index_store():
+    """Return the process-wide index store"""
+    global _index_store
+    if _index_store is None:
+        _index_store = IndexStore()
+    return _index_store
@@ -0,0 +1,174 @@
+"""Streaming, incremental document ingestion
+
+Pages are extracted in batches and pushed through chunking and embedding one
+batch at a time, so early pages become searchable while later ones are still
+being processed.
+"""
+import threading
+import time
+
+import numpy as np
+
+from utils.document import PagedDocument
+from utils.pdf_extraction import count_pages, iter_page_batches
+from utils.storage import document_hash
+from utils.text_cache import get_text_cache
+
+DEFAULT_BATCH_PAGES = 8
+
+
+def iter_cached_batches(pages, batch_pages=DEFAULT_BATCH_PAGES):
+    """Yield (first_page_index, page_texts) batches from already extracted pages"""
+    for start in range(0, len(pages), batch_pages):
+        yield start, pages[start:start + batch_pages]
+
+
+def iter_ingest(page_batches, chunk_fn, embed_fn=None):
+    """Push page batches through chunking and (optionally) embedding, yielding each batch
+
+    chunk_fn(batch) receives the batch dict and returns (chunks, chunk_pages,
+    chunk_spans): the 1-based page number and the (start, end) character
+    span in the whole document of each chunk. Each batch
+    carries a PagedDocument window ('document') positioned at its offset in
+    the whole document, so chunk positions and page lookups are global.
+    """
+    offset = 0
+    chunk_count = 0
+    for start_page, pages in page_batches:
+        document = PagedDocument(pages, first_page=start_page + 1, base_offset=offset)
+        batch = {
+            'start_page': document.first_page,
+            'end_page': document.last_page,
+            'pages': pages,
+            'document': document,
+            'text': document.text,
+            'offset': offset,
+            'first_chunk': chunk_count,
+        }
+        chunks, chunk_pages, chunk_spans = chunk_fn(batch)
+        batch['chunks'] = chunks
+        batch['chunk_pages'] = chunk_pages
+        batch['chunk_spans'] = chunk_spans
+        batch['embeddings'] = embed_fn(chunks) if embed_fn and chunks else None
+
+        offset = document.end_offset
+        chunk_count += len(chunks)
+        yield batch
+
+
+class BackgroundIngest:
+    """Run iter_ingest on a background thread, exposing everything indexed so far
+
+    document, chunks, chunk_pages, chunk_spans and index are updated in place under lock,
+    so callers can hold references to them and search the partial document
+    at any time. on_complete(job) runs on the ingest thread once every page
+    has been processed (e.g. to persist the index).
+    """
+
+    def __init__(self, pdf_bytes, chunk_fn, embed_fn=None, new_index=None,
+                 batch_pages=DEFAULT_BATCH_PAGES, on_complete=None):
+        self.pdf_bytes = pdf_bytes
+        self.doc_hash = document_hash(pdf_bytes)
+        self.chunk_fn = chunk_fn
+        self.embed_fn = embed_fn
+        self.new_index = new_index
+        self.batch_pages = batch_pages
+        self.on_complete = on_complete
+
+        self.lock = threading.Lock()
+        self.document = PagedDocument()
+        self.chunks = []
+        self.chunk_pages = []
+        self.chunk_spans = []
+        self.embeddings = []
+        self.index = None
+        self.total_pages = None
+        self.batches_done = 0
+        self.done = False
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+
+        self._cancelled = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start ingesting on a daemon thread"""
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name=f"ingest-{self.doc_hash[:8]}", daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        """Stop after the current batch (e.g. when another document is uploaded)"""
+        self._cancelled.set()
+
+    def _run(self):
+        cache = get_text_cache()
+        page_batches = None
+        batches = None
+        try:
+            cached_pages = cache.get_pages(self.doc_hash)
+            if cached_pages is not None:
+                self.total_pages = len(cached_pages)
+                page_batches = iter_cached_batches(cached_pages, self.batch_pages)
+            else:
+                self.total_pages = count_pages(self.pdf_bytes)
+                page_batches = iter_page_batches(self.pdf_bytes, self.batch_pages)
+
+            batches = iter_ingest(page_batches, self.chunk_fn, self.embed_fn)
+            for batch in batches:
+                if self._cancelled.is_set():
+                    break
+                with self.lock:
+                    self.document.extend(batch['pages'])
+                    self.chunk_pages.extend(batch['chunk_pages'])
+                    self.chunk_spans.extend(batch['chunk_spans'])
+                    self.chunks.extend(batch['chunks'])
+                    embeddings = batch['embeddings']
+                    if embeddings is not None and len(embeddings):
+                        self.embeddings.append(embeddings)
+                        if self.index is None and self.new_index:
+                            self.index = self.new_index(embeddings.shape[1])
+                        if self.index is not None:
+                            self.index.add(embeddings)
+                    self.batches_done += 1
+
+            if not self._cancelled.is_set():
+                if cached_pages is None:
+                    cache.put_pages(self.doc_hash, self.document.pages)
+                if self.on_complete:
+                    self.on_complete(self)
+        except Exception as e:
+            self.error = e
+        finally:
+            if batches is not None:
+                batches.close()
+            if hasattr(page_batches, "close"):
+                page_batches.close()
+            self.finished_at = time.time()
+            self.done = True
+
+    @property
+    def text(self):
+        """Text of all pages ingested so far"""
+        with self.lock:
+            return self.document.text
+
+    def embedding_matrix(self):
+        """All embeddings added so far as one float32 array, in chunk order"""
+        with self.lock:
+            if not self.embeddings:
+                return None
+            if len(self.embeddings) > 1:
+                self.embeddings[:] = [np.concatenate(self.embeddings)]
+            return self.embeddings[0]
+
+    @property
+    def progress(self):
+        """Fraction of pages ingested, between 0 and 1"""
+        if self.done:
+            return 1.0
+        if not self.total_pages:
+            return 0.0
+        return min(1.0, self.document.num_pages / self.total_pages)
@@ -0,0 +1,383 @@
+"""Background job queue shared by the UI and worker processes
+
+Jobs live in a SQLite table under the shared store. The Streamlit script
+only submits a job and polls its status, so a rerun or a closed tab no
+longer aborts processing, and the server thread is free meanwhile.
+Worker processes claim queued jobs one at a time and run them (PDF
+extraction, sections, chunking, embeddings, then the LLM analyses), so a
+pool of workers keeps every core busy across uploads.
+
+    python -m utils.job_queue [--workers N]
+
+starts a worker pool by hand; the UI also starts one on demand. Idle
+workers exit after a while. A job whose worker dies stops renewing its
+lease and is queued again, up to MAX_ATTEMPTS times.
+
+The API key for a job's analyses is written with the job and erased when
+a worker claims it (or the job is cancelled). Connections use
+secure_delete, so the erased key is zeroed in the database file, and the
+erase is followed by a WAL checkpoint that truncates the log holding the
+older copies. The key is still on disk while the job waits in the queue,
+and a checkpoint blocked by a concurrent reader leaves it in the log
+until the next one succeeds. A job re-run after its worker died no longer
+has the key, so its analyses fail (rather than running on some other
+credential) and the user can submit it again.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.document import PagedDocument
+from utils.storage import atomic_write_bytes, document_hash, get_store_path
+from utils.text_cache import get_text_cache
+
+# Seconds a claimed job is reserved for its worker; renewed while it runs
+LEASE_SECONDS = 60
+
+# Runs of a job before it is marked failed (a worker that dies mid-job counts as one)
+MAX_ATTEMPTS = 3
+
+# Seconds between queue polls of an idle worker, and before it exits
+POLL_INTERVAL = 1.0
+IDLE_EXIT_SECONDS = 600
+
+# A worker pool counts as alive if a worker has checked in this recently
+WORKER_TIMEOUT = 30
+
+# Seconds a started pool has for its first check-in before another one may be started
+STARTUP_TIMEOUT = 300
+
+DEFAULT_QUEUE_WORKERS = int(os.environ.get("AUCTUM_QUEUE_WORKERS", min(4, os.cpu_count() or 1)))
+
+FINISHED = ("done", "failed", "cancelled")
+
+
+class JobQueue:
+    """SQLite-backed job queue; every method opens its own short-lived connection"""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(get_store_path("jobs"), "jobs.sqlite")
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT, doc_hash TEXT, payload TEXT, api_key TEXT, "
+                "status TEXT, result TEXT, error TEXT, attempts INTEGER DEFAULT 0, "
+                "created REAL, started REAL, finished REAL, lease_until REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_doc ON jobs (kind, doc_hash)")
+            conn.execute("CREATE TABLE IF NOT EXISTS workers (pid INTEGER PRIMARY KEY, heartbeat REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL)")
+
+    @contextmanager
+    def _connect(self, immediate=False):
+        # Autocommit connection; immediate=True wraps the block in BEGIN IMMEDIATE, which takes the
+        # write lock up front so a check-then-write (claiming a job) is atomic across processes
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        # Overwrite deleted content (erased API keys) with zeros instead of leaving it in free space
+        conn.execute("PRAGMA secure_delete=ON")
+        try:
+            if not immediate:
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _job(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job.pop('api_key', None)
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def submit(self, kind, payload, doc_hash=None, api_key=None, reuse_done=True):
+        """Queue a job and return its id
+
+        A queued or running job of the same kind, document and payload is
+        returned instead of a new one, as is a done one if reuse_done and
+        its result reports no analysis_errors (partial results are redone).
+        """
+        encoded = json.dumps(payload)
+        with self._connect(immediate=True) as conn:
+            if doc_hash is not None:
+                rows = conn.execute(
+                    "SELECT id, status, payload, result FROM jobs "
+                    "WHERE kind = ? AND doc_hash = ? AND status IN ('queued', 'running', 'done') ORDER BY id DESC",
+                    (kind, doc_hash)
+                ).fetchall()
+                for row in rows:
+                    if json.loads(row['payload']) != payload:
+                        continue
+                    if row['status'] != 'done':
+                        return row['id']
+                    if reuse_done and not (json.loads(row['result'] or "null") or {}).get('analysis_errors'):
+                        return row['id']
+            cursor = conn.execute(
+                "INSERT INTO jobs (kind, doc_hash, payload, api_key, status, created) VALUES (?, ?, ?, ?, 'queued', ?)",
+                (kind, doc_hash, encoded, api_key, time.time())
+            )
+            return cursor.lastrowid
+
+    def get(self, job_id):
+        """The job as a dict (payload and result decoded), or None"""
+        with self._connect() as conn:
+            return self._job(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def claim(self):
+        """Reserve the oldest runnable job, returning (job, api_key), or (None, None) if idle
+
+        Running jobs whose lease has expired (their worker died) are queued
+        again first, or failed once they have used up their attempts.
+        """
+        now = time.time()
+        with self._connect(immediate=True) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', finished = ?, error = 'worker died ' || attempts || ' times' "
+                "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, now, MAX_ATTEMPTS)
+            )
+            conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running' AND lease_until < ?", (now,))
+            row = conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                return None, None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', api_key = NULL, attempts = attempts + 1, started = ?, "
+                "lease_until = ? WHERE id = ?",
+                (now, now + LEASE_SECONDS, row['id'])
+            )
+            job = self._job(row)
+            job.update(status='running', attempts=job['attempts'] + 1, started=now)
+        if row['api_key'] is not None:
+            self._truncate_wal()
+        return job, row['api_key']
+
+    def _truncate_wal(self):
+        """Checkpoint the WAL and truncate it, dropping older page copies that still hold an erased key"""
+        with self._connect() as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def renew(self, job_id):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND status = 'running'",
+                         (time.time() + LEASE_SECONDS, job_id))
+
+    def finish(self, job_id, result=None, error=None):
+        """Record a job's result (done) or error (failed), unless it was cancelled meanwhile"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ?, lease_until = NULL "
+                "WHERE id = ? AND status = 'running'",
+                ("failed" if error else "done", json.dumps(result, default=str), error, time.time(), job_id)
+            )
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job (a running one finishes, but its result is dropped)"""
+        with self._connect() as conn:
+            erased = conn.execute("SELECT api_key IS NOT NULL FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', api_key = NULL, finished = ?, lease_until = NULL "
+                "WHERE id = ? AND status IN ('queued', 'running')",
+                (time.time(), job_id)
+            )
+        if erased and erased[0]:
+            self._truncate_wal()
+
+    def heartbeat(self, pid=None):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO workers (pid, heartbeat) VALUES (?, ?)",
+                         (pid or os.getpid(), time.time()))
+
+    def retire(self, pid=None):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM workers WHERE pid = ?", (pid or os.getpid(),))
+
+    def claim_spawn(self):
+        """Whether the caller should start a worker pool: none alive and none still starting
+
+        A pool counts as starting from its spawn until a worker first checks
+        in, up to STARTUP_TIMEOUT, so a slow start is not mistaken for a dead pool.
+        """
+        now = time.time()
+        with self._connect(immediate=True) as conn:
+            last_heartbeat = conn.execute("SELECT MAX(heartbeat) FROM workers").fetchone()[0] or 0
+            spawned = conn.execute("SELECT value FROM meta WHERE key = 'spawned_at'").fetchone()
+            spawned_at = spawned[0] if spawned is not None else 0
+            alive = last_heartbeat > now - WORKER_TIMEOUT
+            starting = spawned_at > now - WORKER_TIMEOUT or (
+                spawned_at > now - STARTUP_TIMEOUT and last_heartbeat < spawned_at)
+            if alive or starting:
+                return False
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('spawned_at', ?)", (now,))
+            return True
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Return this process's handle on the shared job queue"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
+
+
+def ensure_workers(workers=DEFAULT_QUEUE_WORKERS):
+    """Start a detached worker pool unless one is already running"""
+    if not get_job_queue().claim_spawn():
+        return False
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.Popen(
+        [sys.executable, "-m", "utils.job_queue", "--workers", str(workers)],
+        cwd=root, start_new_session=True,
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    return True
+
+
+def save_upload(pdf_bytes):
+    """Write an uploaded PDF to the store for a worker to read; returns (doc_hash, path)"""
+    doc_hash = document_hash(pdf_bytes)
+    path = os.path.join(get_store_path("jobs", "uploads"), f"{doc_hash}.pdf")
+    if not os.path.exists(path):
+        atomic_write_bytes(path, pdf_bytes)
+    return doc_hash, path
+
+
+def submit_cim_job(pdf_bytes, api_key=None, fast_mode=True, deal=None):
+    """Queue full processing of an uploaded CIM and make sure workers are running; returns the job id
+
+    A done job is only reused while its text is still in the text cache.
+    """
+    doc_hash, path = save_upload(pdf_bytes)
+    job_id = get_job_queue().submit(
+        "cim", {'path': path, 'fast_mode': fast_mode, 'deal': deal, 'analyses': bool(api_key)},
+        doc_hash=doc_hash, api_key=api_key, reuse_done=get_text_cache().has_pages(doc_hash)
+    )
+    ensure_workers()
+    return job_id
+
+
+def run_cim_job(payload, api_key=None):
+    """Worker: ingest a CIM into the store, then run the red-flag and valuation analyses"""
+    from utils.batch_ingest import EMBEDDING_AVAILABLE, ingest_file
+
+    result = ingest_file(payload['path'], fast_mode=payload.get('fast_mode', True), deal=payload.get('deal'),
+                         embed=EMBEDDING_AVAILABLE)
+    if payload.get('analyses') and not api_key:
+        # The key is erased at the first claim, so a re-run after a worker died has none
+        result['analysis_errors'] = {'analyses': "the job was re-run without its API key; process the CIM again"}
+    elif payload.get('analyses'):
+        from utils.ai_analysis import detect_red_flags, extract_valuation_metrics
+        from utils.llm_scheduler import BATCH, scheduled
+        from utils.orchestrator import AnalysisTask, run_analyses
+
+        text = PagedDocument(get_text_cache().get_pages(result['doc_hash'])).text
+        analyses = run_analyses([
+            AnalysisTask("red_flags", scheduled(detect_red_flags, api_key, priority=BATCH),
+                         text, api_key, default=[]),
+            AnalysisTask("valuation_data", scheduled(extract_valuation_metrics, api_key, priority=BATCH),
+                         text, api_key, default={}),
+        ], api_key)
+        for name, outcome in analyses.items():
+            result[name] = outcome['result']
+        result['analysis_errors'] = {name: outcome['error'] for name, outcome in analyses.items() if outcome['error']}
+    return result
+
+
+JOB_HANDLERS = {
+    'cim': run_cim_job,
+}
+
+
+def _keep_alive(queue, stop, job_id=None):
+    """Renew this worker's heartbeat (and a job's lease) until stop is set"""
+    while not stop.wait(LEASE_SECONDS / 3):
+        if job_id is not None:
+            queue.renew(job_id)
+        queue.heartbeat()
+
+
+@contextmanager
+def _kept_alive(queue, job_id=None):
+    stop = threading.Event()
+    renewer = threading.Thread(target=_keep_alive, args=(queue, stop, job_id), daemon=True)
+    renewer.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        renewer.join()
+
+
+def worker_loop(workers=1):
+    """Claim and run jobs until idle for IDLE_EXIT_SECONDS"""
+    queue = get_job_queue()
+    # Check in before the slow imports and model load, and keep checking in through them
+    queue.heartbeat()
+    with _kept_alive(queue):
+        from utils.batch_ingest import EMBEDDING_AVAILABLE, load_worker_model
+
+        # Load the embedding model up front, with this worker's share of the cores
+        if EMBEDDING_AVAILABLE:
+            load_worker_model(workers)
+    idle_since = time.monotonic()
+    while True:
+        queue.heartbeat()
+        job, api_key = queue.claim()
+        if job is None:
+            if time.monotonic() - idle_since > IDLE_EXIT_SECONDS:
+                queue.retire()
+                return
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        # Keep the lease (and this worker's heartbeat) fresh while the job runs
+        with _kept_alive(queue, job['id']):
+            try:
+                queue.finish(job['id'], result=JOB_HANDLERS[job['kind']](job['payload'], api_key))
+            except Exception as e:
+                queue.finish(job['id'], error=f"{type(e).__name__}: {e}")
+        idle_since = time.monotonic()
+
+
+def run_workers(workers=DEFAULT_QUEUE_WORKERS):
+    """Run worker_loop in `workers` processes and wait for them all to exit"""
+    processes = [multiprocessing.Process(target=worker_loop, args=(workers,), name=f"auctum-worker-{i}")
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Auctum background job workers")
+    parser.add_argument("--workers", "-j", type=int, default=DEFAULT_QUEUE_WORKERS, help="worker processes")
+    args = parser.parse_args(argv)
+    run_workers(max(1, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""Streaming chat completions"""
+from utils.context_packer import count_tokens
+from utils.llm_scheduler import INTERACTIVE
+
+
+def stream_chat(client, model, messages, cancel_event=None, scheduler=None, priority=INTERACTIVE, **kwargs):
+    """Yield the text of a chat completion as it is generated
+
+    Stops early, closing the HTTP stream so no more tokens are generated or
+    billed, when cancel_event is set or the consumer stops iterating. With a
+    scheduler, the request waits its turn in the priority lane and is retried
+    on rate limits until the stream opens.
+    """
+    create = client.chat.completions.create
+    if scheduler is None:
+        stream = create(model=model, messages=messages, stream=True, **kwargs)
+    else:
+        tokens = sum(count_tokens(message["content"], model) for message in messages) + kwargs.get("max_tokens", 0)
+        stream = scheduler.call(create, model=model, messages=messages, stream=True,
+                                tokens=tokens, priority=priority, **kwargs)
+    try:
+        for chunk in stream:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        stream.close()
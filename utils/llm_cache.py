@@ -0,0 +1,102 @@
+"""Persistent LLM response cache
+
+Responses are stored in SQLite under the shared store, keyed by a hash of
+everything that determines them (model, system message, context, prompt,
+sampling settings). Entries expire after a TTL, and the least recently
+used are evicted once the cache outgrows its size limit.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.storage import get_store_path
+
+DEFAULT_TTL_SECONDS = float(os.environ.get("AUCTUM_LLM_CACHE_TTL_HOURS", "168")) * 3600
+DEFAULT_MAX_BYTES = int(os.environ.get("AUCTUM_LLM_CACHE_MB", "64")) * 1024 * 1024
+
+
+def response_cache_key(model, system_message, context, prompt, temperature, **params):
+    """SHA-256 hex key for a completion request; params are any other settings that change the answer"""
+    payload = json.dumps([model, system_message, context, prompt, temperature, sorted(params.items())])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Completed LLM responses in a SQLite table, with TTL and LRU size eviction"""
+
+    def __init__(self, path=None, ttl_seconds=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path or os.path.join(get_store_path("llm_cache"), "responses.sqlite")
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, size INTEGER, created REAL, accessed REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call, so sessions on any thread can share the file
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """The cached response for key, or None if absent or expired"""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def put(self, key, model, response):
+        """Store a completed response, then expire and evict as needed"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, len(response.encode("utf-8")), now, now)
+            )
+        self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used until under max_bytes"""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_seconds,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Return the shared LLM response cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMResponseCache()
+        return _cache
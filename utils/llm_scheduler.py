@@ -0,0 +1,177 @@
+"""Rate-limit-aware scheduling of OpenAI requests
+
+Every request for an API key goes through that key's scheduler, which
+holds token buckets for requests and tokens per minute and hands out
+capacity in priority order: interactive chat is served before background
+batch analyses, first come first served within a lane. Retryable failures
+(429s, timeouts, connection and 5xx errors) are retried with exponential
+backoff and full jitter; a 429 also pauses the whole key for its
+Retry-After, so concurrent callers back off together instead of piling on.
+"""
+import asyncio
+import hashlib
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+try:
+    import openai
+    RETRYABLE_ERRORS = tuple(
+        getattr(openai, name) for name in
+        ("RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError")
+        if hasattr(openai, name)
+    )
+    RATE_LIMIT_ERRORS = tuple(getattr(openai, name) for name in ("RateLimitError",) if hasattr(openai, name))
+except ImportError:
+    RETRYABLE_ERRORS = ()
+    RATE_LIMIT_ERRORS = ()
+
+# Priority lanes; lower is served first
+INTERACTIVE = 0
+BATCH = 1
+
+# Account quotas the scheduler keeps under
+DEFAULT_RPM = int(os.environ.get("AUCTUM_OPENAI_RPM", 500))
+DEFAULT_TPM = int(os.environ.get("AUCTUM_OPENAI_TPM", 200_000))
+
+# Tokens assumed for a request whose size is not known up front
+DEFAULT_REQUEST_TOKENS = 4000
+
+MAX_RETRIES = 5
+BASE_DELAY = 1.0
+MAX_DELAY = 30.0
+
+
+class TokenBucket:
+    """capacity units, refilled continuously at rate units per second (not thread-safe on its own)"""
+
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until amount units are available (a request above capacity waits for a full bucket)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def consume(self, amount):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+
+class RequestScheduler:
+    """Request and token buckets for one API key, granted in priority order"""
+
+    def __init__(self, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM):
+        self.requests = TokenBucket(rpm, rpm / 60)
+        self.tokens = TokenBucket(tpm, tpm / 60)
+        self.paused_until = 0.0
+        self.stats = {'granted': 0, 'retries': 0, 'rate_limited': 0, 'waited_seconds': 0.0}
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+
+    def acquire(self, tokens=DEFAULT_REQUEST_TOKENS, priority=BATCH):
+        """Block until this request may be sent; higher-priority waiters go first"""
+        started = time.monotonic()
+        with self._cond:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    wait = None
+                    if self._waiting[0] == ticket:
+                        wait = max(self.paused_until - time.monotonic(),
+                                   self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                        if wait <= 0:
+                            self.requests.consume(1)
+                            self.tokens.consume(tokens)
+                            self.stats['granted'] += 1
+                            self.stats['waited_seconds'] += time.monotonic() - started
+                            return
+                    self._cond.wait(wait)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+    def pause(self, seconds):
+        """Hold every request for this key for the next seconds (after a 429)"""
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.stats['rate_limited'] += 1
+            self._cond.notify_all()
+
+    def _backoff(self, error, attempt):
+        """Seconds to wait before retry number attempt (0-based)"""
+        delay = random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+        if isinstance(error, RATE_LIMIT_ERRORS):
+            retry_after = _retry_after(error)
+            self.pause(retry_after if retry_after is not None else delay)
+        with self._cond:
+            self.stats['retries'] += 1
+        return delay
+
+    def call(self, fn, *args, tokens=DEFAULT_REQUEST_TOKENS, priority=BATCH, max_retries=MAX_RETRIES, **kwargs):
+        """fn(*args, **kwargs) once scheduled, retried with backoff on retryable errors"""
+        for attempt in itertools.count():
+            self.acquire(tokens, priority)
+            try:
+                return fn(*args, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                if attempt >= max_retries:
+                    raise
+                time.sleep(self._backoff(e, attempt))
+
+    async def call_async(self, fn, *args, tokens=DEFAULT_REQUEST_TOKENS, priority=BATCH,
+                         max_retries=MAX_RETRIES, **kwargs):
+        """await fn(*args, **kwargs) once scheduled, retried with backoff on retryable errors"""
+        for attempt in itertools.count():
+            await asyncio.to_thread(self.acquire, tokens, priority)
+            try:
+                return await fn(*args, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                if attempt >= max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(e, attempt))
+
+
+def _retry_after(error):
+    """Retry-After seconds from an API error's response, if given"""
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(api_key):
+    """Return the shared scheduler for an API key"""
+    key = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()
+    with _schedulers_lock:
+        scheduler = _schedulers.get(key)
+        if scheduler is None:
+            scheduler = _schedulers[key] = RequestScheduler()
+        return scheduler
+
+
+def scheduled(fn, api_key, tokens=DEFAULT_REQUEST_TOKENS, priority=BATCH):
+    """fn wrapped to run through the key's scheduler, e.g. for an AnalysisTask"""
+    def run(*args, **kwargs):
+        return get_scheduler(api_key).call(fn, *args, tokens=tokens, priority=priority, **kwargs)
+    return run
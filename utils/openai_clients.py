@@ -0,0 +1,112 @@
+"""Pooled OpenAI clients, one per API key
+
+Clients are built once and reused for every request, so turns after the
+first skip client construction and TLS/HTTP connection setup. Each client
+counts the requests it sends and the distinct connections that carried
+them, to show how often keep-alive connections are reused.
+"""
+import hashlib
+import os
+import threading
+
+import httpx
+import openai
+
+# Connection pool per client
+POOL_SIZE = int(os.environ.get("AUCTUM_OPENAI_POOL_SIZE", 20))
+KEEPALIVE_CONNECTIONS = int(os.environ.get("AUCTUM_OPENAI_KEEPALIVE", 10))
+KEEPALIVE_EXPIRY = float(os.environ.get("AUCTUM_OPENAI_KEEPALIVE_EXPIRY", 60))
+
+
+def pool_limits():
+    return httpx.Limits(
+        max_connections=POOL_SIZE,
+        max_keepalive_connections=KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY
+    )
+
+
+class ConnectionStats:
+    """Requests sent and distinct connections used by one client"""
+
+    def __init__(self):
+        self.requests = 0
+        self._connections = set()
+        self._lock = threading.Lock()
+
+    def record(self, response):
+        # httpx exposes the underlying socket stream; a new one means a new connection
+        stream = response.extensions.get("network_stream")
+        with self._lock:
+            self.requests += 1
+            if stream is not None:
+                self._connections.add(id(stream))
+
+    @property
+    def connections(self):
+        return len(self._connections)
+
+    @property
+    def reuse_rate(self):
+        """Share of requests sent over an already open connection"""
+        if not self.requests:
+            return 0.0
+        return 1 - self.connections / self.requests
+
+    def as_dict(self):
+        return {'requests': self.requests, 'connections': self.connections, 'reuse_rate': self.reuse_rate}
+
+
+_clients = {}
+_async_clients = {}
+_stats = {}
+_lock = threading.Lock()
+
+
+def _key(api_key):
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+def _stats_for(key):
+    stats = _stats.get(key)
+    if stats is None:
+        stats = _stats[key] = ConnectionStats()
+    return stats
+
+
+def get_client(api_key):
+    """Shared openai.OpenAI client for an API key"""
+    key = _key(api_key)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            stats = _stats_for(key)
+            http_client = httpx.Client(limits=pool_limits(), event_hooks={'response': [stats.record]})
+            client = _clients[key] = openai.OpenAI(api_key=api_key, http_client=http_client)
+        return client
+
+
+def get_async_client(api_key):
+    """Shared openai.AsyncOpenAI client for an API key
+
+    Async connections belong to the event loop that opened them, so only
+    call this from one long-lived loop (the analysis orchestrator's).
+    """
+    key = _key(api_key)
+    with _lock:
+        client = _async_clients.get(key)
+        if client is None:
+            stats = _stats_for(key)
+
+            async def record(response):
+                stats.record(response)
+
+            http_client = httpx.AsyncClient(limits=pool_limits(), event_hooks={'response': [record]})
+            client = _async_clients[key] = openai.AsyncOpenAI(api_key=api_key, http_client=http_client)
+        return client
+
+
+def connection_stats(api_key):
+    """Request and connection counts for an API key's clients"""
+    with _lock:
+        return _stats_for(_key(api_key)).as_dict()
@@ -0,0 +1,105 @@
+"""Concurrent execution of independent LLM analyses
+
+Analyses (red flags, valuation metrics, memo sections, summaries) are
+independent calls that mostly wait on the network, so they run together on
+one long-lived asyncio loop: total time is the slowest analysis rather than
+the sum. Each runs under a shared concurrency limit and its own timeout.
+
+An analysis is either a coroutine function, awaited on the loop and given
+the shared pooled AsyncOpenAI client as client=, or a plain function, run
+in a worker thread. A timed-out thread cannot be killed; its result is
+simply discarded.
+"""
+import asyncio
+import inspect
+import os
+import threading
+import time
+
+from utils.openai_clients import get_async_client
+
+# Analyses in flight at once, across every session on the server
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("AUCTUM_ANALYSIS_CONCURRENCY", 4))
+
+# Seconds before an analysis is abandoned
+DEFAULT_TIMEOUT = float(os.environ.get("AUCTUM_ANALYSIS_TIMEOUT", 120))
+
+
+class AnalysisTask:
+    """One analysis to run: fn(*args, **kwargs), stored under name
+
+    default is the result used when the analysis fails or times out.
+    """
+
+    def __init__(self, name, fn, *args, timeout=None, default=None, **kwargs):
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.timeout = timeout
+        self.default = default
+
+
+class AnalysisOrchestrator:
+    """Runs batches of analyses concurrently on a background event loop
+
+    The loop lives for the whole process, so async clients created on it
+    keep their connection pools between batches.
+    """
+
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY, default_timeout=DEFAULT_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.default_timeout = default_timeout
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="analysis-loop", daemon=True)
+        self._thread.start()
+        self._semaphore = None
+
+    async def _run_task(self, task, api_key):
+        timeout = task.timeout or self.default_timeout
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                if inspect.iscoroutinefunction(task.fn):
+                    client = get_async_client(api_key) if api_key else None
+                    call = task.fn(*task.args, client=client, **task.kwargs)
+                else:
+                    call = asyncio.to_thread(task.fn, *task.args, **task.kwargs)
+                result, error = await asyncio.wait_for(call, timeout), None
+            except asyncio.TimeoutError:
+                result, error = task.default, f"timed out after {timeout:g}s"
+            except Exception as e:
+                result, error = task.default, str(e)
+        return {'result': result, 'error': error, 'seconds': time.perf_counter() - started}
+
+    async def _run_all(self, tasks, api_key):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        outcomes = await asyncio.gather(*(self._run_task(task, api_key) for task in tasks))
+        return {task.name: outcome for task, outcome in zip(tasks, outcomes)}
+
+    def run(self, tasks, api_key=None):
+        """Run tasks concurrently and wait for all of them
+
+        Returns {name: {'result', 'error', 'seconds'}}; a failed or timed-out
+        task has its default as result and a message as error.
+        """
+        return asyncio.run_coroutine_threadsafe(self._run_all(list(tasks), api_key), self._loop).result()
+
+
+_orchestrator = None
+_orchestrator_lock = threading.Lock()
+
+
+def get_orchestrator():
+    """Return the shared analysis orchestrator, starting its loop on first use"""
+    global _orchestrator
+    with _orchestrator_lock:
+        if _orchestrator is None:
+            _orchestrator = AnalysisOrchestrator()
+        return _orchestrator
+
+
+def run_analyses(tasks, api_key=None):
+    """Run analyses concurrently on the shared orchestrator (see AnalysisOrchestrator.run)"""
+    return get_orchestrator().run(tasks, api_key)
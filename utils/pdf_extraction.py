@@ -0,0 +1,174 @@
+"""Parallel per-page PDF text extraction"""
+import io
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import PyPDF2
+
+from utils.storage import remove_quietly
+
+# Number of extraction processes; defaults to one per core
+DEFAULT_WORKERS = int(os.environ.get("AUCTUM_EXTRACT_WORKERS", os.cpu_count() or 1))
+
+# Small documents are faster to extract inline than to ship to the pool
+SERIAL_PAGE_THRESHOLD = 16
+
+# Page ranges handed out per worker, so slow pages don't leave cores idle
+TASKS_PER_WORKER = 2
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+# Worker side: (path, reader) of the PDF this process last opened
+_worker_reader = (None, None)
+
+
+def get_extraction_pool(max_workers=None):
+    """Return the shared extraction process pool, creating it on first use"""
+    global _pool, _pool_workers
+    max_workers = max_workers or DEFAULT_WORKERS
+    with _pool_lock:
+        if _pool is None or _pool_workers != max_workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=max_workers)
+            _pool_workers = max_workers
+        return _pool
+
+
+def _reset_extraction_pool():
+    """Drop a broken pool so the next call starts a fresh one"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = None
+        _pool_workers = 0
+
+
+def split_page_range(num_pages, num_tasks):
+    """Split [0, num_pages) into at most num_tasks contiguous (start, end) ranges"""
+    num_tasks = max(1, min(num_tasks, num_pages))
+    size, extra = divmod(num_pages, num_tasks)
+    ranges = []
+    start = 0
+    for i in range(num_tasks):
+        end = start + size + (1 if i < extra else 0)
+        if end > start:
+            ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def _spill_pdf(pdf_bytes):
+    """Write PDF bytes to a temp file the pool workers can open; the caller removes it"""
+    fd, path = tempfile.mkstemp(suffix=".pdf", prefix="auctum-extract-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(pdf_bytes)
+    return path
+
+
+def _worker_open(pdf_path):
+    """Worker: the reader for a spilled PDF, read from disk once per worker process"""
+    global _worker_reader
+    path, reader = _worker_reader
+    if path != pdf_path:
+        with open(pdf_path, "rb") as f:
+            reader = PyPDF2.PdfReader(io.BytesIO(f.read()))
+        _worker_reader = (pdf_path, reader)
+    return reader
+
+
+def _extract_page_range(pdf_path, start, end):
+    """Worker: extract the text of pages [start, end) of a spilled PDF
+
+    Tasks carry only the path and page range; the document itself crosses
+    to each worker once, through the file, however many ranges it handles.
+    """
+    reader = _worker_open(pdf_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def read_pdf_bytes(pdf_file):
+    """Return the raw bytes of an uploaded file, path or bytes object"""
+    if isinstance(pdf_file, (bytes, bytearray)):
+        return bytes(pdf_file)
+    if isinstance(pdf_file, (str, os.PathLike)):
+        with open(pdf_file, "rb") as f:
+            return f.read()
+    if hasattr(pdf_file, "getvalue"):
+        return pdf_file.getvalue()
+    pdf_file.seek(0)
+    data = pdf_file.read()
+    pdf_file.seek(0)
+    return data
+
+
+def count_pages(pdf_bytes):
+    """Number of pages in a PDF, without extracting any text"""
+    return len(PyPDF2.PdfReader(io.BytesIO(pdf_bytes)).pages)
+
+
+def extract_pages(pdf_bytes, max_workers=None):
+    """Extract the text of every page, in page order, using the process pool for large PDFs"""
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    num_pages = len(reader.pages)
+    workers = max_workers or DEFAULT_WORKERS
+
+    if workers <= 1 or num_pages < SERIAL_PAGE_THRESHOLD:
+        return [page.extract_text() or "" for page in reader.pages]
+
+    ranges = split_page_range(num_pages, workers * TASKS_PER_WORKER)
+    pdf_path = _spill_pdf(pdf_bytes)
+    try:
+        pool = get_extraction_pool(workers)
+        futures = [pool.submit(_extract_page_range, pdf_path, start, end) for start, end in ranges]
+        pages = []
+        for future in futures:
+            pages.extend(future.result())
+        return pages
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM on a huge scan) - fall back to extracting inline
+        _reset_extraction_pool()
+        return [page.extract_text() or "" for page in reader.pages]
+    finally:
+        remove_quietly(pdf_path)
+
+
+def iter_page_batches(pdf_bytes, batch_pages=8, max_workers=None):
+    """Yield (first_page_index, page_texts) batches in page order as soon as each is ready
+
+    All batches are queued on the process pool up front; the generator hands
+    them back in order, so the caller can start on early pages while later
+    ones are still being extracted.
+    """
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    num_pages = len(reader.pages)
+    workers = max_workers or DEFAULT_WORKERS
+    ranges = [(start, min(start + batch_pages, num_pages)) for start in range(0, num_pages, batch_pages)]
+
+    if workers <= 1 or num_pages < SERIAL_PAGE_THRESHOLD:
+        for start, end in ranges:
+            yield start, [reader.pages[i].extract_text() or "" for i in range(start, end)]
+        return
+
+    pdf_path = _spill_pdf(pdf_bytes)
+    pool = get_extraction_pool(workers)
+    futures = [pool.submit(_extract_page_range, pdf_path, start, end) for start, end in ranges]
+    try:
+        for (start, end), future in zip(ranges, futures):
+            try:
+                pages = future.result()
+            except BrokenProcessPool:
+                _reset_extraction_pool()
+                pages = [reader.pages[i].extract_text() or "" for i in range(start, end)]
+            yield start, pages
+    finally:
+        # Abandoned generator (e.g. a new upload): drop work that hasn't started
+        for future in futures:
+            future.cancel()
+        remove_quietly(pdf_path)
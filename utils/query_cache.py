@@ -0,0 +1,120 @@
+"""Process-wide LRU caches for query embeddings and search results
+
+Both caches are shared by every session on the server, so a canned query
+(quick-search buttons, repeated questions) is encoded and searched once.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+# Entry limits; query vectors are small, result lists hold chunk text
+QUERY_EMBEDDING_CACHE_SIZE = int(os.environ.get("AUCTUM_QUERY_CACHE_SIZE", 1024))
+SEARCH_RESULT_CACHE_SIZE = int(os.environ.get("AUCTUM_RESULT_CACHE_SIZE", 256))
+
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive form of a query, used in cache keys"""
+    return " ".join(query.lower().split())
+
+
+class LRUCache:
+    """Thread-safe mapping that drops the least recently used entry when full"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._entries.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SearchResultCache:
+    """Search results keyed by (document hash, query, top_k)
+
+    Each entry remembers the index version it was computed against (any
+    hashable that changes when the index does, e.g. its vector count); a
+    lookup with a different version drops the entry and misses.
+    """
+
+    def __init__(self, max_entries=SEARCH_RESULT_CACHE_SIZE):
+        self._cache = LRUCache(max_entries)
+
+    def get(self, doc_hash, query, top_k, version):
+        key = (doc_hash, normalize_query(query), top_k)
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] != version:
+            self._cache.pop(key)
+            return None
+        return list(entry[1])
+
+    def put(self, doc_hash, query, top_k, version, results):
+        self._cache.put((doc_hash, normalize_query(query), top_k), (version, list(results)))
+
+    @property
+    def stats(self):
+        return {'entries': len(self._cache), 'hits': self._cache.hits, 'misses': self._cache.misses}
+
+
+_embedding_cache = None
+_result_cache = None
+_caches_lock = threading.Lock()
+
+
+def get_query_embedding_cache():
+    """Return the shared query-vector cache"""
+    global _embedding_cache
+    with _caches_lock:
+        if _embedding_cache is None:
+            _embedding_cache = LRUCache(QUERY_EMBEDDING_CACHE_SIZE)
+        return _embedding_cache
+
+
+def get_search_result_cache():
+    """Return the shared search-result cache"""
+    global _result_cache
+    with _caches_lock:
+        if _result_cache is None:
+            _result_cache = SearchResultCache()
+        return _result_cache
+
+
+def encode_query(model, model_name, query):
+    """(1, dim) embedding of a query, encoded at most once per model and normalized query"""
+    cache = get_query_embedding_cache()
+    key = (model_name, normalize_query(query))
+    embedding = cache.get(key)
+    if embedding is None:
+        embedding = model.encode([query])
+        # Shared between callers, so make it read-only
+        embedding.setflags(write=False)
+        cache.put(key, embedding)
+    return embedding
@@ -0,0 +1,172 @@
+"""Hybrid retrieval: parallel lexical/vector legs fused with reciprocal rank fusion
+
+Each leg is a callable (query, k) -> chunk ids, best first. Legs run
+concurrently on a shared thread pool and are fused by rank, so their raw
+scores (BM25, L2 distance, ...) never need calibrating against each other.
+The fused top-N can then be re-ranked with a local cross-encoder. Both the
+search and the re-rank run under latency budgets; a leg that misses its
+budget is dropped and a re-rank that misses keeps the fused order.
+"""
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+
+try:
+    from sentence_transformers import CrossEncoder
+    CROSS_ENCODER_AVAILABLE = True
+except ImportError:
+    CROSS_ENCODER_AVAILABLE = False
+
+DEFAULT_RETRIEVAL_CONFIG = {
+    # Candidates each leg returns before fusion
+    'candidates': 50,
+    # RRF damping constant; larger values flatten the gap between ranks
+    'rrf_k': 60,
+    # Per-leg multipliers on the RRF contribution (missing legs weigh 1.0)
+    'weights': {},
+    # Fused candidates passed to the cross-encoder
+    'rerank_top_n': 20,
+    # Cross-encoder model, e.g. 'cross-encoder/ms-marco-MiniLM-L-6-v2'; None disables re-ranking
+    'rerank_model': os.environ.get("AUCTUM_RERANK_MODEL") or None,
+    # Latency budgets in milliseconds for the parallel legs and for the re-rank
+    'search_budget_ms': int(os.environ.get("AUCTUM_SEARCH_BUDGET_MS", 300)),
+    'rerank_budget_ms': int(os.environ.get("AUCTUM_RERANK_BUDGET_MS", 500)),
+}
+
+# Threads shared by every session's legs and re-ranks
+RETRIEVAL_WORKERS = 4
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def retrieval_config(config=None, **overrides):
+    """DEFAULT_RETRIEVAL_CONFIG updated with a partial config and keyword overrides"""
+    merged = dict(DEFAULT_RETRIEVAL_CONFIG)
+    merged.update(config or {})
+    merged.update(overrides)
+    return merged
+
+
+def get_retrieval_executor():
+    """Return the shared retrieval thread pool, creating it on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+        return _executor
+
+
+@lru_cache(maxsize=2)
+def load_cross_encoder(model_name):
+    """Load (once per process) a cross-encoder, or None if unavailable"""
+    if not CROSS_ENCODER_AVAILABLE or not model_name:
+        return None
+    try:
+        return CrossEncoder(model_name)
+    except Exception:
+        return None
+
+
+def reciprocal_rank_fusion(rankings, k=60, weights=None):
+    """Fuse {leg: [id, ...]} rankings into [(score, id), ...], best first
+
+    An id scores sum(weight / (k + rank)) over the legs that returned it,
+    rank starting at 1.
+    """
+    scores = {}
+    for leg, ranking in rankings.items():
+        weight = (weights or {}).get(leg, 1.0)
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (k + rank)
+    return sorted(((score, doc_id) for doc_id, score in scores.items()), key=lambda item: (-item[0], item[1]))
+
+
+def _run_legs(query, legs, k, budget, stats):
+    """Run every leg concurrently; keep those that finish within budget seconds
+
+    If none finish in time, wait for the first one so a search never comes
+    back empty just because it was slow.
+    """
+    executor = get_retrieval_executor()
+    started = time.perf_counter()
+
+    def timed(leg):
+        result = list(legs[leg](query, k))
+        stats[f'{leg}_ms'] = (time.perf_counter() - started) * 1000
+        return result
+
+    futures = {executor.submit(timed, leg): leg for leg in legs}
+    done, pending = wait(futures, timeout=budget)
+    if not done:
+        done, pending = wait(futures, return_when=FIRST_COMPLETED)
+
+    rankings = {}
+    for future in done:
+        try:
+            rankings[futures[future]] = future.result()
+        except Exception as e:
+            stats.setdefault('errors', {})[futures[future]] = str(e)
+    stats['timed_out'] = sorted(futures[future] for future in pending)
+    return rankings
+
+
+def _rerank(query, candidates, texts, config, stats):
+    """Re-order (score, id) candidates with the cross-encoder, within the re-rank budget"""
+    model = load_cross_encoder(config['rerank_model'])
+    top_n = candidates[:config['rerank_top_n']]
+    if model is None or len(top_n) < 2:
+        return candidates
+
+    started = time.perf_counter()
+    pairs = [(query, texts[doc_id]) for _, doc_id in top_n]
+    future = get_retrieval_executor().submit(model.predict, pairs)
+    try:
+        scores = future.result(timeout=config['rerank_budget_ms'] / 1000)
+    except Exception:
+        stats['rerank_skipped'] = True
+        return candidates
+    stats['rerank_ms'] = (time.perf_counter() - started) * 1000
+
+    order = sorted(range(len(top_n)), key=lambda i: -scores[i])
+    stats['reranked'] = True
+    return [top_n[i] for i in order] + candidates[len(top_n):]
+
+
+def hybrid_search(query, legs, top_k=5, texts=None, config=None, stats=None):
+    """Top-k chunk ids for a query as [(score, id), ...], fusing every leg
+
+    legs maps a name to a callable (query, k) -> ranked ids. texts (indexable
+    by id) enables the cross-encoder re-rank when a rerank_model is set,
+    which re-orders the head but keeps each id's fused score. stats, if
+    given, receives per-leg and re-rank timings.
+    """
+    config = retrieval_config(config)
+    stats = {} if stats is None else stats
+    if not legs:
+        return []
+
+    started = time.perf_counter()
+    rankings = _run_legs(query, legs, max(top_k, config['candidates']), config['search_budget_ms'] / 1000, stats)
+    fused = reciprocal_rank_fusion(rankings, config['rrf_k'], config['weights'])
+    if texts is not None and config['rerank_model']:
+        fused = _rerank(query, fused, texts, config, stats)
+    stats['total_ms'] = (time.perf_counter() - started) * 1000
+    return fused[:top_k]
+
+
+def search_complete(stats):
+    """Whether a hybrid_search ran in full: no leg missed its budget or failed, and no re-rank was skipped
+
+    Only complete results are worth caching; a degraded one (e.g. BM25-only
+    on a cold model) would otherwise be served until the index changes.
+    """
+    return not stats.get('timed_out') and not stats.get('errors') and not stats.get('rerank_skipped')
+
+
+def max_fused_score(legs, config=None):
+    """RRF score of an id ranked first by every leg, for turning scores into a 0-1 match"""
+    config = retrieval_config(config)
+    return sum(config['weights'].get(leg, 1.0) for leg in legs) / (config['rrf_k'] + 1)
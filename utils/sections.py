@@ -0,0 +1,127 @@
+"""Single-pass section header detection and section tree
+
+One compiled multiline regex finds every header line in a single pass over
+the text, recording its exact offset, so a header is never confused with
+an earlier mention of the same words (e.g. in the table of contents).
+Headers nest by level: numbered headers by their depth ("2.1" is level 2),
+ALL CAPS lines at level 1 and Title Case lines at level 2. A section runs
+from its header to the next header at the same or a higher level.
+
+Sections are plain dicts so they can be stored in the text cache:
+    {'index', 'title', 'level', 'start', 'end', 'first_page', 'last_page',
+     'parent', 'children'}
+where parent and children are indices into the flat list, which is in
+document order.
+"""
+import re
+
+# One alternative per header style, in priority order
+HEADER_SCANNER = re.compile(
+    r"^[ \t]*(?:"
+    r"(?P<numbered>(?P<number>\d{1,3}(?:\.\d{1,3})*)\.?[ \t]+[A-Z][A-Za-z&, \t-]*[A-Za-z])"
+    r"|(?P<caps>[A-Z][A-Z& \t]{9,}[A-Z])"
+    r"|(?P<title>[A-Z][A-Za-z& \t]{4,}[A-Za-z])"
+    r")[ \t]*\r?$",
+    re.MULTILINE
+)
+
+HEADER_KINDS = ("numbered", "caps", "title")
+
+# Text cache key of a document's section tree; bumped whenever detection changes
+SECTION_TREE_KEY = "section_tree:2"
+
+# Headers kept per document; lower-priority styles are dropped first
+MAX_HEADERS = 15
+
+# Non-blank characters a header line needs before the next header to count as a real section start
+MIN_BODY_CHARS = 20
+
+
+def scan_headers(text, max_headers=MAX_HEADERS):
+    """(start, title, level) of header lines in document order, found in one pass
+
+    A title that appears more than once (a table of contents, running page
+    headers) keeps its first occurrence with body text after it, i.e. at
+    least MIN_BODY_CHARS before the next header line, or its last one if
+    none has. Beyond max_headers, numbered headers are kept first, then
+    ALL CAPS, then Title Case.
+    """
+    matches = []
+    for match in HEADER_SCANNER.finditer(text):
+        kind = match.lastgroup if match.lastgroup != "number" else "numbered"
+        matches.append((match, kind))
+
+    occurrences = {}
+    for i, (match, kind) in enumerate(matches):
+        title = " ".join(match.group(kind).split())
+        body_end = matches[i + 1][0].start() if i + 1 < len(matches) else len(text)
+        has_body = len("".join(text[match.end():body_end].split())) >= MIN_BODY_CHARS
+        chosen = occurrences.get(title)
+        # Keep the first occurrence with a body; until one is found, the latest
+        if chosen is None or not chosen[1]:
+            occurrences[title] = (i, has_body)
+
+    candidates = []
+    for title, (i, _) in occurrences.items():
+        match, kind = matches[i]
+        if kind == "numbered":
+            level = match.group("number").count(".") + 1
+        else:
+            level = 1 if kind == "caps" else 2
+        candidates.append((HEADER_KINDS.index(kind), match.start(kind), title, level))
+
+    kept = sorted(candidates, key=lambda candidate: (candidate[0], candidate[1]))[:max_headers]
+    return [(start, title, level) for _, start, title, level in sorted(kept, key=lambda candidate: candidate[1])]
+
+
+def build_section_tree(text, document=None, max_headers=MAX_HEADERS):
+    """Flat list of section dicts (see module docstring), with parent/child links and page spans"""
+    headers = scan_headers(text, max_headers)
+    sections = []
+    # Sections whose end is not known yet, outermost first
+    open_stack = []
+    for index, (start, title, level) in enumerate(headers):
+        while open_stack and sections[open_stack[-1]]['level'] >= level:
+            sections[open_stack.pop()]['end'] = start
+        parent = open_stack[-1] if open_stack else None
+        sections.append({
+            'index': index, 'title': title, 'level': level, 'start': start, 'end': len(text),
+            'parent': parent, 'children': []
+        })
+        if parent is not None:
+            sections[parent]['children'].append(index)
+        open_stack.append(index)
+
+    for section in sections:
+        if document is not None:
+            section['first_page'], section['last_page'] = document.page_span(section['start'], section['end'])
+        else:
+            section['first_page'] = section['last_page'] = None
+    return sections
+
+
+def section_text(text, section):
+    """The text of a section, header included"""
+    return text[section['start']:section['end']].strip()
+
+
+def section_texts(text, sections):
+    """{title: text} for every section, the mapping the analysis pages expect"""
+    return {section['title']: section_text(text, section) for section in sections}
+
+
+def format_section_list(sections):
+    """Nested markdown bullet list of section titles with their pages"""
+    lines = []
+    for section in sections:
+        pages = ""
+        if section['first_page'] is not None:
+            first, last = section['first_page'], section['last_page']
+            pages = f" (page {first})" if first == last else f" (pages {first}-{last})"
+        depth = 0
+        parent = section['parent']
+        while parent is not None:
+            depth += 1
+            parent = sections[parent]['parent']
+        lines.append(f"{'  ' * depth}- {section['title']}{pages}")
+    return "\n".join(lines)
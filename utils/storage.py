@@ -0,0 +1,49 @@
+"""Shared on-disk store locations and document hashing"""
+import hashlib
+import os
+import tempfile
+
+# Root of everything Auctum persists locally (caches, indexes, job queue)
+STORE_DIR = os.environ.get("AUCTUM_STORE_DIR", os.path.join(os.path.expanduser("~"), ".auctum"))
+
+
+def get_store_path(*parts):
+    """Return a directory under the store root, creating it if needed"""
+    path = os.path.join(STORE_DIR, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def document_hash(data):
+    """SHA-256 hex digest identifying a document by its raw bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def temp_path_for(path):
+    """A new empty temp file beside path, unique even between threads of one process
+
+    It is on the same filesystem, so os.replace(temp, path) is atomic.
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".tmp",
+                                    dir=os.path.dirname(path) or ".")
+    os.close(fd)
+    return tmp_path
+
+
+def remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def atomic_write_bytes(path, data):
+    """Write a file via a temp file and rename, so readers never see a partial write"""
+    tmp_path = temp_path_for(path)
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        remove_quietly(tmp_path)
+        raise
@@ -0,0 +1,161 @@
+"""Hierarchical map-reduce summarization of whole documents
+
+The document is split into page-aligned pieces that each fit one request.
+Every piece is summarized concurrently (map), then the partial summaries
+are summarized in groups, level by level, until one remains (reduce).
+Wall time grows with the depth of the tree, not the page count. Every
+intermediate summary goes through the LLM response cache, and only the
+final reduce sees the focus, so re-running a summary with a different
+focus over the same pieces only pays for that last request.
+"""
+import asyncio
+import os
+
+from utils.context_packer import CHARS_PER_TOKEN, count_tokens
+from utils.llm_cache import get_llm_cache, response_cache_key
+from utils.llm_scheduler import BATCH, get_scheduler
+from utils.orchestrator import AnalysisTask, run_analyses
+
+DEFAULT_SUMMARY_MODEL = os.environ.get("AUCTUM_SUMMARY_MODEL", "gpt-3.5-turbo-16k")
+
+# Prompt tokens of document text per map request
+MAP_PIECE_TOKENS = 3000
+
+# Partial summaries combined per reduce request
+REDUCE_FANOUT = 8
+
+# Completion tokens per partial summary and for the final one
+PARTIAL_SUMMARY_TOKENS = 400
+FINAL_SUMMARY_TOKENS = 1200
+
+# Summary requests in flight at once for one document
+MAX_CONCURRENT_REQUESTS = int(os.environ.get("AUCTUM_SUMMARY_CONCURRENCY", 8))
+
+# Seconds allowed for a whole document summary
+SUMMARY_TIMEOUT = 600
+
+TEMPERATURE = 0.2
+
+SYSTEM_MESSAGE = "You are an investment analyst summarizing a confidential information memorandum (CIM)."
+
+
+def split_for_summary(document, max_tokens=MAP_PIECE_TOKENS):
+    """(label, text) pieces of consecutive pages, each within max_tokens
+
+    A single page too long for one piece is cut into character windows.
+    """
+    pieces = []
+    current, first = [], None
+    current_tokens = 0
+
+    def flush(last):
+        if current:
+            label = f"Page {first}" if first == last else f"Pages {first}-{last}"
+            pieces.append((label, "\n\n".join(current)))
+
+    for offset, page_text in enumerate(document.pages):
+        page = document.first_page + offset
+        if not page_text.strip():
+            continue
+        tokens = count_tokens(page_text)
+        if current and current_tokens + tokens > max_tokens:
+            flush(page - 1)
+            current, current_tokens = [], 0
+        if tokens > max_tokens:
+            window = max_tokens * CHARS_PER_TOKEN
+            for start in range(0, len(page_text), window):
+                pieces.append((f"Page {page}", page_text[start:start + window]))
+            continue
+        if not current:
+            first = page
+        current.append(page_text)
+        current_tokens += tokens
+    flush(document.last_page)
+    return pieces
+
+
+def _map_prompt(label, text):
+    return (f"Summarize this excerpt ({label}) of the CIM in a few dense bullet points. Keep every figure, "
+            f"name and date exactly as written, and cite the page.\n\n{text}")
+
+
+def _reduce_prompt(summaries, focus, final):
+    # Intermediate merges stay focus-free so their cached responses serve every focus
+    focus_line = f" Focus on: {focus}." if focus and final else ""
+    goal = ("Write a comprehensive, well-structured summary of the whole document"
+            if final else "Merge these partial summaries into one set of bullet points, dropping repetition")
+    return (f"{goal}. Keep every figure exactly as written and keep page citations.{focus_line}\n\n"
+            + "\n\n---\n\n".join(summaries))
+
+
+async def _complete(client, model, prompt, max_tokens, semaphore, stats):
+    """One cached completion"""
+    cache = get_llm_cache()
+    key = response_cache_key(model, SYSTEM_MESSAGE, "", prompt, TEMPERATURE, max_tokens=max_tokens)
+    cached = cache.get(key)
+    if cached is not None:
+        stats['cached'] = stats.get('cached', 0) + 1
+        return cached
+    async with semaphore:
+        # Batch lane: waits behind interactive chat and retries rate limits with backoff
+        response = await get_scheduler(client.api_key).call_async(
+            client.chat.completions.create,
+            model=model,
+            messages=[
+                {"role": "system", "content": SYSTEM_MESSAGE},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=max_tokens,
+            temperature=TEMPERATURE,
+            tokens=count_tokens(SYSTEM_MESSAGE + prompt) + max_tokens,
+            priority=BATCH
+        )
+    stats['requests'] = stats.get('requests', 0) + 1
+    summary = response.choices[0].message.content or ""
+    cache.put(key, model, summary)
+    return summary
+
+
+async def summarize_pieces(pieces, client=None, model=DEFAULT_SUMMARY_MODEL, focus=None,
+                           max_concurrency=MAX_CONCURRENT_REQUESTS, stats=None):
+    """Map-reduce summary of (label, text) pieces using an AsyncOpenAI client"""
+    if client is None:
+        raise RuntimeError("An async OpenAI client is required for summarization")
+    if not pieces:
+        return ""
+    stats = {} if stats is None else stats
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    # Map: every piece at once
+    summaries = await asyncio.gather(*(
+        _complete(client, model, _map_prompt(label, text), PARTIAL_SUMMARY_TOKENS, semaphore, stats)
+        for label, text in pieces
+    ))
+    stats['levels'] = 1
+
+    # Reduce: groups of partial summaries, level by level, until one is left
+    while True:
+        final = len(summaries) <= REDUCE_FANOUT
+        groups = [summaries[i:i + REDUCE_FANOUT] for i in range(0, len(summaries), REDUCE_FANOUT)]
+        summaries = await asyncio.gather(*(
+            _complete(client, model, _reduce_prompt(group, focus, final),
+                      FINAL_SUMMARY_TOKENS if final else PARTIAL_SUMMARY_TOKENS, semaphore, stats)
+            for group in groups
+        ))
+        stats['levels'] += 1
+        if final:
+            return summaries[0]
+
+
+def summarize_document(document, api_key, model=DEFAULT_SUMMARY_MODEL, focus=None, stats=None):
+    """Map-reduce summary of a whole PagedDocument, on the shared analysis loop"""
+    pieces = split_for_summary(document)
+    if stats is not None:
+        stats['pieces'] = len(pieces)
+    outcome = run_analyses([
+        AnalysisTask("summary", summarize_pieces, pieces, model=model, focus=focus, stats=stats,
+                     timeout=SUMMARY_TIMEOUT)
+    ], api_key)["summary"]
+    if outcome['error']:
+        raise RuntimeError(outcome['error'])
+    return outcome['result']
@@ -0,0 +1,133 @@
+"""Content-addressed cache of extracted PDF text and derived data"""
+import gzip
+import json
+import os
+import threading
+
+from utils.storage import get_store_path, atomic_write_bytes, document_hash
+
+DEFAULT_MAX_BYTES = int(os.environ.get("AUCTUM_TEXT_CACHE_MB", "512")) * 1024 * 1024
+
+
+class TextCache:
+    """On-disk cache keyed by document hash, evicted least-recently-used by total size
+
+    Each entry holds the per-page text of a document plus named derived values
+    (sections, chunks) computed from it.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or get_store_path("text_cache")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, doc_hash):
+        return os.path.join(self.directory, f"{doc_hash}.json.gz")
+
+    def _load(self, doc_hash):
+        path = self._path(doc_hash)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Touch on read so eviction is LRU rather than FIFO
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def _store(self, doc_hash, entry):
+        data = gzip.compress(json.dumps(entry).encode("utf-8"))
+        atomic_write_bytes(self._path(doc_hash), data)
+        self.evict()
+
+    def has_pages(self, doc_hash):
+        """Whether a document is cached, without reading it"""
+        return os.path.exists(self._path(doc_hash))
+
+    def get_pages(self, doc_hash):
+        """Return the cached page texts for a document, or None"""
+        entry = self._load(doc_hash)
+        return entry["pages"] if entry else None
+
+    def put_pages(self, doc_hash, pages):
+        """Cache the page texts of a document, keeping any derived values"""
+        with self._lock:
+            entry = self._load(doc_hash) or {"derived": {}}
+            entry["pages"] = list(pages)
+            self._store(doc_hash, entry)
+
+    def get_derived(self, doc_hash, key):
+        """Return a cached derived value (e.g. sections, chunks), or None"""
+        entry = self._load(doc_hash)
+        if not entry:
+            return None
+        return entry["derived"].get(key)
+
+    def put_derived(self, doc_hash, key, value):
+        """Cache a JSON-serialisable value derived from a cached document"""
+        with self._lock:
+            entry = self._load(doc_hash)
+            if entry is None:
+                return
+            entry["derived"][key] = value
+            self._store(doc_hash, entry)
+
+    def cached(self, doc_hash, key, compute):
+        """Return the derived value for key, computing and caching it on a miss"""
+        value = self.get_derived(doc_hash, key)
+        if value is None:
+            value = compute()
+            self.put_derived(doc_hash, key, value)
+        return value
+
+    def evict(self):
+        """Delete least-recently-used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json.gz"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+_text_cache = None
+
+
+def get_text_cache():
+    """Return the process-wide text cache"""
+    global _text_cache
+    if _text_cache is None:
+        _text_cache = TextCache()
+    return _text_cache
+
+
+def extract_pages_cached(pdf_bytes, max_workers=None):
+    """Return (doc_hash, page texts), extracting the PDF only on a cache miss"""
+    from utils.pdf_extraction import extract_pages
+
+    doc_hash = document_hash(pdf_bytes)
+    cache = get_text_cache()
+    pages = cache.get_pages(doc_hash)
+    if pages is None:
+        pages = extract_pages(pdf_bytes, max_workers)
+        cache.put_pages(doc_hash, pages)
+    return doc_hash, pages
@@ -0,0 +1,279 @@
+"""ANN index selection, training and recall checks
+
+Flat search is exact but scans every vector per query. As the vector count
+grows the index switches to HNSW (graph, fast, more memory), IVF-Flat
+(clustered, exact vectors) and finally IVF-PQ (clustered, compressed
+vectors, least memory). Every knob lives in the config dict.
+
+Independently, stored codes can be quantized ('sq8': int8 scalar
+quantization, 4x smaller; 'pq': product quantization, 4 * dim / pq_m times
+smaller) while the exact float32 vectors stay on disk. Searches against a
+quantized index fetch rerank_factor * k candidates and re-rank them with
+the exact vectors, which recovers most of the lost accuracy.
+"""
+import math
+import os
+
+import numpy as np
+
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+DEFAULT_INDEX_CONFIG = {
+    # 'auto' picks by vector count; or force 'flat', 'hnsw', 'ivf_flat', 'ivf_pq'
+    'kind': 'auto',
+    # Upper vector counts for each kind when kind is 'auto'
+    'flat_max': 20_000,
+    'hnsw_max': 300_000,
+    'ivf_flat_max': 2_000_000,
+    # HNSW: neighbours per node (memory/recall) and build/search beam widths
+    'hnsw_m': 32,
+    'ef_construction': 80,
+    'ef_search': 64,
+    # IVF: number of clusters (None = 4 * sqrt(n)) and clusters probed per query
+    'nlist': None,
+    'nprobe': 16,
+    # PQ: sub-quantizers (bytes per vector at 8 bits) and bits per code
+    'pq_m': 32,
+    'pq_bits': 8,
+    # Vectors sampled to train IVF/PQ (faiss wants ~39+ per cluster)
+    'train_size': 100_000,
+    # Code compression for resident indexes: None, 'sq8' or 'pq'
+    'quantization': os.environ.get("AUCTUM_INDEX_QUANTIZATION") or None,
+    # Candidates fetched per result when re-ranking a quantized index with exact vectors
+    'rerank_factor': 4,
+}
+
+# PQ with 8-bit codes needs at least 256 training vectors; smaller sets fall back to sq8
+PQ_MIN_VECTORS = 256
+
+
+def index_config(config=None, **overrides):
+    """DEFAULT_INDEX_CONFIG updated with a partial config and keyword overrides"""
+    merged = dict(DEFAULT_INDEX_CONFIG)
+    merged.update(config or {})
+    merged.update(overrides)
+    return merged
+
+
+def choose_index_kind(num_vectors, config=None):
+    """Index kind for a corpus of num_vectors under the given config"""
+    config = index_config(config)
+    if config['kind'] != 'auto':
+        return config['kind']
+    if num_vectors <= config['flat_max']:
+        return 'flat'
+    if num_vectors <= config['hnsw_max']:
+        return 'hnsw'
+    if num_vectors <= config['ivf_flat_max']:
+        return 'ivf_flat'
+    return 'ivf_pq'
+
+
+def _build_kind(num_vectors, config, kind=None):
+    kind = kind or choose_index_kind(num_vectors, config)
+    # Too few vectors to train clusters: exact search is cheap at this size anyway
+    if kind.startswith('ivf') and num_vectors < 39 * 4:
+        return 'flat'
+    return kind
+
+
+def _quantization(num_vectors, config):
+    if config['quantization'] == 'pq' and num_vectors < PQ_MIN_VECTORS:
+        return 'sq8'
+    return config['quantization']
+
+
+def built_layout(num_vectors, config=None, kind=None):
+    """(kind, quantization) of build_index's result, as index_kind and index_quantization report them"""
+    config = index_config(config)
+    kind = _build_kind(num_vectors, config, kind)
+    quantization = _quantization(num_vectors, config)
+    if kind == 'ivf_pq' or (kind == 'ivf_flat' and quantization == 'pq'):
+        return 'ivf_pq', 'pq'
+    return kind, quantization
+
+
+def _nlist(num_vectors, config):
+    nlist = config['nlist'] or int(4 * math.sqrt(num_vectors))
+    # Keep at least ~39 training points per centroid; training sees at most train_size vectors
+    return max(1, min(nlist, min(num_vectors, config['train_size']) // 39))
+
+
+def _pq_m(dim, config):
+    """Largest sub-quantizer count <= pq_m that divides the dimension"""
+    for m in range(min(config['pq_m'], dim), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def _training_sample(embeddings, config):
+    n = len(embeddings)
+    if n <= config['train_size']:
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+    rows = np.sort(np.random.default_rng(0).choice(n, config['train_size'], replace=False))
+    return np.ascontiguousarray(embeddings[rows], dtype=np.float32)
+
+
+def new_index(dim, kind, num_vectors, config=None):
+    """An empty (untrained) index of the given kind and the config's quantization"""
+    config = index_config(config)
+    quantization = _quantization(num_vectors, config)
+    pq_m = _pq_m(dim, config)
+
+    if kind == 'flat':
+        if quantization == 'sq8':
+            return faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit)
+        if quantization == 'pq':
+            return faiss.IndexPQ(dim, pq_m, config['pq_bits'])
+        return faiss.IndexFlatL2(dim)
+    if kind == 'hnsw':
+        if quantization == 'sq8':
+            index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_8bit, config['hnsw_m'])
+        elif quantization == 'pq':
+            index = faiss.IndexHNSWPQ(dim, pq_m, config['hnsw_m'])
+        else:
+            index = faiss.IndexHNSWFlat(dim, config['hnsw_m'])
+        index.hnsw.efConstruction = config['ef_construction']
+        return index
+    quantizer = faiss.IndexFlatL2(dim)
+    nlist = _nlist(num_vectors, config)
+    if kind == 'ivf_flat' and quantization == 'sq8':
+        return faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, faiss.ScalarQuantizer.QT_8bit)
+    if kind == 'ivf_flat' and quantization != 'pq':
+        return faiss.IndexIVFFlat(quantizer, dim, nlist)
+    if kind in ('ivf_flat', 'ivf_pq'):
+        return faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, config['pq_bits'])
+    raise ValueError(f"Unknown index kind: {kind}")
+
+
+def build_index(embeddings, config=None, kind=None):
+    """Choose, train and fill an index for the embeddings"""
+    config = index_config(config)
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    num_vectors, dim = embeddings.shape
+    kind = _build_kind(num_vectors, config, kind)
+
+    index = new_index(dim, kind, num_vectors, config)
+    if not index.is_trained:
+        index.train(_training_sample(embeddings, config))
+    index.add(embeddings)
+    configure_search(index, config)
+    return index
+
+
+def index_kind(index):
+    """Kind name of an index built by this module (ignoring code quantization)"""
+    if isinstance(index, faiss.IndexHNSW):
+        return 'hnsw'
+    if isinstance(index, faiss.IndexIVFPQ):
+        return 'ivf_pq'
+    if isinstance(index, faiss.IndexIVF):
+        return 'ivf_flat'
+    return 'flat'
+
+
+def index_quantization(index):
+    """None for exact float32 codes, else 'sq8' or 'pq'"""
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexHNSWSQ, faiss.IndexIVFScalarQuantizer)):
+        return 'sq8'
+    if isinstance(index, (faiss.IndexPQ, faiss.IndexHNSWPQ, faiss.IndexIVFPQ)):
+        return 'pq'
+    return None
+
+
+def configure_search(index, config=None):
+    """Apply the config's search-time knobs (nprobe / efSearch) to an index"""
+    config = index_config(config)
+    kind = index_kind(index)
+    if kind == 'hnsw':
+        index.hnsw.efSearch = config['ef_search']
+    elif kind.startswith('ivf'):
+        index.nprobe = min(config['nprobe'], index.nlist)
+    return index
+
+
+def search_params(index, config=None, selector=None):
+    """Per-query FAISS search parameters for an index, optionally with an ID selector"""
+    config = index_config(config)
+    kind = index_kind(index)
+    if kind == 'hnsw':
+        params = faiss.SearchParametersHNSW(efSearch=config['ef_search'])
+    elif kind.startswith('ivf'):
+        params = faiss.SearchParametersIVF(nprobe=min(config['nprobe'], index.nlist))
+    elif selector is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+    if selector is not None:
+        params.sel = selector
+    return params
+
+
+def rerank_exact(query, candidate_ids, exact_vectors, k):
+    """Re-score candidate ids by exact L2 distance, returning the best k (distances, ids)"""
+    candidate_ids = np.asarray([i for i in candidate_ids if i >= 0], dtype=np.int64)
+    if not len(candidate_ids):
+        return np.empty(0, dtype=np.float32), candidate_ids
+    # Sorted ids read the memory-mapped vectors sequentially
+    candidate_ids = np.sort(candidate_ids)
+    vectors = np.asarray(exact_vectors[candidate_ids], dtype=np.float32)
+    distances = ((vectors - query.reshape(1, -1)) ** 2).sum(axis=1)
+    order = np.argsort(distances)[:k]
+    return distances[order], candidate_ids[order]
+
+
+def search_index(index, queries, k, config=None, selector=None, exact_vectors=None):
+    """Search an index, re-ranking with exact vectors when its codes are quantized
+
+    Returns (distances, ids) shaped like faiss's, i.e. one row per query.
+    """
+    config = index_config(config)
+    queries = np.ascontiguousarray(queries, dtype=np.float32).reshape(-1, index.d)
+    params = search_params(index, config, selector)
+    if exact_vectors is None or index_quantization(index) is None:
+        return index.search(queries, k, params=params)
+
+    fetch = min(index.ntotal, k * config['rerank_factor'])
+    _, candidates = index.search(queries, fetch, params=params)
+    distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+    ids = np.full((len(queries), k), -1, dtype=np.int64)
+    for row, (query, candidate_ids) in enumerate(zip(queries, candidates)):
+        row_distances, row_ids = rerank_exact(query, candidate_ids, exact_vectors, k)
+        distances[row, :len(row_ids)] = row_distances
+        ids[row, :len(row_ids)] = row_ids
+    return distances, ids
+
+
+def index_memory_bytes(index):
+    """Approximate in-RAM size of an index, via its serialised form"""
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def recall_at_k(index, embeddings, k=10, num_queries=200, config=None, rerank=True):
+    """Fraction of the exact top-k neighbours the index returns, for sampled stored vectors
+
+    Ground truth comes from a flat (brute-force) scan over the same vectors,
+    so this is the accuracy given up in exchange for the ANN speedup (and,
+    for quantized codes, the memory saving - after re-ranking unless
+    rerank is False).
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    n = len(embeddings)
+    if n == 0:
+        return 1.0
+    k = min(k, n)
+    rows = np.random.default_rng(1).choice(n, min(num_queries, n), replace=False)
+    queries = embeddings[rows]
+
+    flat = faiss.IndexFlatL2(embeddings.shape[1])
+    flat.add(embeddings)
+    _, expected = flat.search(queries, k)
+    _, found = search_index(index, queries, k, config, exact_vectors=embeddings if rerank else None)
+
+    hits = sum(len(set(e) & set(f)) for e, f in zip(expected, found))
+    return hits / (len(queries) * k)